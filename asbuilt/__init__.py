@@ -0,0 +1,6 @@
+"""Generate As-Built documents for Azure subscriptions.
+
+The pipeline collects the inventory (asbuilt.collect, asbuilt.graph), groups it into
+sections (asbuilt.process) and renders it (asbuilt.render); asbuilt.cli wires the stages.
+"""
+__version__ = '0.2.0'
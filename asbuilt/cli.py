@@ -0,0 +1,363 @@
+"""Command line entry point: argument parsing, inventory collection and output."""
+import os
+import time
+import logging
+import argparse
+from datetime import datetime, timezone
+from functools import partial
+from .session import ARM_BASE_URL, TOKEN_CACHE_PATH, http_connection_metrics
+from .collect import FetchCheckpoint, checkpoint_path, fetch_network_details, fetch_resources, load_azure_data
+from .graph import ENRICHERS, RESOURCE_CHANGES_RETENTION_DAYS, enrich_resources, fetch_incremental_inventory, fetch_network_details_graph, fetch_resources_graph, load_resource_graph_data
+from .snapshot import SNAPSHOT_DIR, SNAPSHOT_ERRORS, SNAPSHOT_TTL_HOURS, find_latest_snapshot, load_snapshot, save_snapshot, snapshot_age_hours
+from .process import COUNT_LABELS, process_resource_data, set_address_spaces, vnet_address_prefixes
+from .spool import Spooler
+from .metrics import RUN_REPORT_VERSION, StageMetrics, fetch_metrics, format_timings, write_prometheus_textfile, write_run_report
+from .columnar import process_inventory_table, read_inventory_dataset, resources_to_table, write_inventory_dataset
+from .render import RENDERERS, render_outputs
+from .logs import LOG_FILE, LOG_LEVEL, configure_logging, stop_logging
+
+logger = logging.getLogger(__name__)
+
+def _format_list(value):
+    """Parse a comma-separated list of output formats."""
+    formats = [item.strip().lower() for item in value.split(',') if item.strip()]
+    unknown = [item for item in formats if item not in RENDERERS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown format(s) {', '.join(unknown)}; choose from {', '.join(RENDERERS)}")
+    return formats
+
+def _log_level(value):
+    """Parse LEVEL or LOGGER=LEVEL into (logger name, level name); the root logger's name is ''."""
+    name, _, level = value.rpartition('=')
+    level = level.strip().upper()
+    if not isinstance(logging.getLevelName(level), int):
+        raise argparse.ArgumentTypeError(f"unknown log level {level!r}")
+    return name.strip(), level
+
+def _worker_count(value):
+    """Parse a number of worker processes, where 0 means none."""
+    try:
+        count = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid worker count {value!r}")
+    if count < 0:
+        raise argparse.ArgumentTypeError(f"worker count must be 0 or more, not {count}")
+    return count
+
+def parse_args(argv=None):
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(prog='asbuilt', description="Generate an As-Built document for Azure resources.")
+    parser.add_argument('--subscription-id', dest='subscription_ids', action='append', metavar='ID',
+                        help="Subscription to document; repeat for several (default: $AZURE_SUBSCRIPTION_IDS).")
+    parser.add_argument('--backend', choices=['arm', 'graph'], default='arm',
+                        help="Collect the inventory per subscription through ARM (default) or with Resource Graph queries.")
+    parser.add_argument('--arm-base-url', default=ARM_BASE_URL, metavar='URL',
+                        help="ARM endpoint to fetch from instead of Azure's, such as a local asbuilt.fake_arm server "
+                             "(default: $ASBUILT_ARM_BASE_URL). An http:// URL is used without authentication.")
+    parser.add_argument('--graph-fixture', metavar='FILE',
+                        help="Serve Resource Graph queries from a JSON fixture instead of Azure (implies --backend graph).")
+    snapshot_group = parser.add_mutually_exclusive_group()
+    snapshot_group.add_argument('--from-snapshot', nargs='?', const='latest', metavar='FILE',
+                                help="Render from a saved inventory snapshot (the latest one if FILE is omitted), ignoring the TTL.")
+    snapshot_group.add_argument('--refresh', action='store_true',
+                                help="Ignore cached snapshots and fetch the inventory from Azure.")
+    snapshot_group.add_argument('--incremental', action='store_true',
+                                help="Fetch only resources changed since the latest snapshot and merge them into it.")
+    snapshot_group.add_argument('--resume', action='store_true',
+                                help="Continue an interrupted fetch from its checkpoint, skipping the subscriptions and pages already fetched.")
+    parser.add_argument('--token-cache', nargs='?', const=TOKEN_CACHE_PATH, metavar='FILE',
+                        help=f"Keep the resolved credential and its token in an encrypted cache (default file: {TOKEN_CACHE_PATH}) "
+                             "so later runs skip the credential chain.")
+    parser.add_argument('--no-enrich', dest='enrich', action='store_false',
+                        help="Skip the Resource Graph queries that fill per-type columns such as VM Size and Access Tier.")
+    parser.add_argument('--format', dest='formats', type=_format_list, action='extend', metavar='FORMATS',
+                        help=f"Comma-separated output formats, repeatable: {', '.join(RENDERERS)} (default: docx).")
+    parser.add_argument('--output', default='asbuilt', metavar='BASENAME',
+                        help="Output file name without extension (default: asbuilt).")
+    parser.add_argument('--stream-docx', action=argparse.BooleanOptionalAction, default=True,
+                        help="Stream the document body into the .docx (default) instead of building it in memory.")
+    parser.add_argument('--render-workers', type=_worker_count, default=0, metavar='N',
+                        help="Render docx sections in N worker processes and merge them in order (implies --stream-docx; "
+                             "default: 0, in this process).")
+    dataset_group = parser.add_mutually_exclusive_group()
+    dataset_group.add_argument('--columnar', metavar='DIR',
+                               help="Land the inventory in a Parquet dataset in DIR and build the report from it (needs pyarrow).")
+    dataset_group.add_argument('--from-dataset', metavar='DIR',
+                               help="Build the report from a Parquet dataset written by --columnar, without fetching.")
+    parser.add_argument('--snapshot-dir', default=SNAPSHOT_DIR,
+                        help=f"Directory for inventory snapshots (default: {SNAPSHOT_DIR}).")
+    parser.add_argument('--snapshot-ttl', type=float, default=SNAPSHOT_TTL_HOURS, metavar='HOURS',
+                        help=f"Reuse the latest snapshot if it is younger than this (default: {SNAPSHOT_TTL_HOURS:g}, 0 disables).")
+    parser.add_argument('--log-level', dest='log_levels', type=_log_level, action='append', metavar='[LOGGER=]LEVEL',
+                        help=f"Log level (default: {LOG_LEVEL}), or the level of one logger such as azure or asbuilt.collect; repeatable.")
+    parser.add_argument('--log-file', default=LOG_FILE, metavar='FILE',
+                        help=f"Log file, overwritten on each run (default: {LOG_FILE}); an empty string logs to the console only.")
+    parser.add_argument('--log-json', action='store_true',
+                        help="Write the log file (or the console, without one) as JSON lines.")
+    parser.add_argument('--run-report', metavar='FILE',
+                        help="Write the timings and fetch counters of the run as JSON to FILE (default: BASENAME.run.json).")
+    parser.add_argument('--no-run-report', dest='run_report', action='store_const', const='',
+                        help="Do not write a run report.")
+    parser.add_argument('--prometheus-textfile', metavar='FILE',
+                        help="Also write the run report as a Prometheus textfile, such as one read by node_exporter's textfile collector.")
+    parser.add_argument('--timings', action='store_true',
+                        help="Print the time and memory of each stage and the fetch counters of each subscription on exit.")
+    return parser.parse_args(argv)
+
+def prepare_records(graph_info, vnet_prefixes, resource_type, records, whole):
+    """Fill in a batch of spooled records: VNet address spaces and, with graph_info, per-type details.
+
+    A batch that is only part of its type is enriched by resource ID; a whole type
+    with a single type-scoped query.
+    """
+    if resource_type == "Microsoft.Network/virtualNetworks":
+        set_address_spaces(records, vnet_prefixes)
+    if graph_info and resource_type in ENRICHERS:
+        enrich_resources(graph_info, {resource_type: records}, by_id=not whole)
+
+def collect_inventory(args, subscription_ids, checkpoint=None, spooler=None, metrics=None):
+    """Fetch resources and network details from Azure with the selected backend.
+
+    A checkpoint records the progress of the ARM backend; Resource Graph fetches
+    are a few queries and are simply repeated. With a spooler, resources are
+    spooled by type, and VNet address spaces and per-type details are filled in a
+    batch at a time as records are spilled, so the network details come first.
+    Each part is timed as a step of metrics, if given.
+    """
+    metrics = metrics or StageMetrics()
+    graph_info = None
+    use_graph = args.backend == 'graph' or args.graph_fixture
+    with metrics.step('authenticate'):
+        if use_graph:
+            graph_info = load_resource_graph_data(subscription_ids, fixture=args.graph_fixture, token_cache=args.token_cache,
+                                                  base_url=args.arm_base_url)
+        else:
+            resource_clients, network_clients = load_azure_data(subscription_ids, args.token_cache, args.arm_base_url)
+        enrich_info = None
+        if args.enrich:
+            try:
+                # The ARM backend still fetches the details with Resource Graph, which returns a type in bulk
+                enrich_info = graph_info or load_resource_graph_data(subscription_ids, token_cache=args.token_cache,
+                                                                     base_url=args.arm_base_url)
+            except ImportError as e:
+                logger.warning("Skipping per-type details, which need azure-mgmt-resourcegraph: %s", e)
+    with metrics.step('network details'):
+        if use_graph:
+            network_details = fetch_network_details_graph(graph_info)
+        else:
+            network_details = fetch_network_details(network_clients, checkpoint=checkpoint)
+    if spooler:
+        spooler.prepare = partial(prepare_records, enrich_info, vnet_address_prefixes(network_details))
+
+    with metrics.step('resources'):
+        if use_graph:
+            all_resources = fetch_resources_graph(graph_info, spooler=spooler)
+        else:
+            all_resources = fetch_resources(resource_clients, checkpoint=checkpoint, spooler=spooler)
+    with metrics.step('details'):
+        if spooler:
+            spooler.seal(all_resources)
+        elif enrich_info:
+            enrich_resources(enrich_info, all_resources)
+
+    pool_stats = http_connection_metrics()
+    if pool_stats["requests"]:
+        logger.info("HTTP: %s requests over %s connections (%s reused a pooled connection).",
+                    pool_stats['requests'], pool_stats['connections_opened'], pool_stats['connections_reused'])
+    return all_resources, network_details
+
+def collect_inventory_checkpointed(args, subscription_ids, fetched_at, spooler=None, metrics=None):
+    """Run collect_inventory with a checkpoint, resuming the previous one with --resume.
+
+    The checkpoint is removed once every subscription has been fetched; otherwise it
+    is kept so that --resume only fetches what is missing. Returns the inventory, the
+    time the (first) fetch started and whether every subscription was fetched.
+    """
+    if args.backend == 'graph' or args.graph_fixture:
+        if args.resume:
+            logger.warning("Checkpoints cover the ARM backend only; fetching the full inventory.")
+        # The Resource Graph fetchers raise rather than return part of the inventory
+        try:
+            all_resources, network_details = collect_inventory(args, subscription_ids, spooler=spooler, metrics=metrics)
+        except Exception as e:
+            raise SystemExit(f"Error fetching the inventory from Resource Graph; no snapshot was saved: {e}")
+        return all_resources, network_details, fetched_at, True
+
+    path = checkpoint_path(subscription_ids, args.snapshot_dir, inventory_source(args))
+    checkpoint = None
+    if args.resume:
+        if os.path.exists(path):
+            try:
+                checkpoint = FetchCheckpoint.load(path)
+            except (OSError, ValueError, KeyError) as e:
+                logger.error("Error loading checkpoint %s; fetching the full inventory: %s", path, e)
+        else:
+            logger.warning("No checkpoint found at %s; fetching the full inventory.", path)
+    if checkpoint is None:
+        checkpoint = FetchCheckpoint.start(path)
+
+    try:
+        all_resources, network_details = collect_inventory(args, subscription_ids, checkpoint, spooler, metrics)
+    finally:
+        missing = [sub_id for sub_id in subscription_ids
+                   if sub_id not in checkpoint.completed_subscriptions() or sub_id not in checkpoint.vnets]
+        checkpoint.close(remove=not missing)
+    if missing:
+        logger.warning("%s subscriptions were not fully fetched; rerun with --resume to fetch only those. "
+                       "Checkpoint kept at %s.", len(missing), path)
+    return all_resources, network_details, checkpoint.started, not missing
+
+def inventory_source(args):
+    """Return where the run fetches its inventory from, or None for Azure with enrichment.
+
+    Snapshots and checkpoints are keyed by it, so a real Azure run never reuses an
+    inventory fetched from a fake ARM server, a fixture or without enrichment.
+    """
+    parts = []
+    if args.graph_fixture:
+        parts.append(f"fixture={os.path.abspath(args.graph_fixture)}")
+    if args.arm_base_url:
+        parts.append(f"arm={args.arm_base_url.rstrip('/')}")
+    if not args.enrich:
+        parts.append('no-enrich')
+    return ';'.join(parts) or None
+
+def load_inventory(args, subscription_ids, spooler=None, metrics=None):
+    """Return resources and network details from a snapshot, an incremental update or a full fetch.
+
+    A full fetch, or a snapshot that is reused, spools the resources with the spooler,
+    if one is given. The steps are timed in metrics.
+    """
+    metrics = metrics or StageMetrics()
+    source = inventory_source(args)
+    snapshot_path = None
+    if args.from_snapshot:
+        snapshot_path = find_latest_snapshot(subscription_ids, args.snapshot_dir, source) if args.from_snapshot == 'latest' else args.from_snapshot
+        if not snapshot_path:
+            raise SystemExit(f"No inventory snapshot found in {args.snapshot_dir} for the given subscription IDs.")
+    elif not (args.refresh or args.incremental or args.resume) and args.snapshot_ttl > 0:
+        latest = find_latest_snapshot(subscription_ids, args.snapshot_dir, source)
+        if latest and snapshot_age_hours(latest) < args.snapshot_ttl:
+            snapshot_path = latest
+
+    if snapshot_path:
+        try:
+            with metrics.step('load snapshot'):
+                all_resources, network_details, snapshot = load_snapshot(snapshot_path, spooler)
+            if snapshot.get('source') != source:
+                # Only an explicit --from-snapshot FILE can come from another source
+                logger.warning("Snapshot %s was fetched from %s, not %s.", snapshot_path, snapshot.get('source') or 'Azure',
+                               source or 'Azure')
+        except SNAPSHOT_ERRORS as e:
+            if args.from_snapshot:
+                raise SystemExit(f"Error loading inventory snapshot {snapshot_path}: {e}")
+            # A snapshot from an older version, or a damaged one, is a cache miss
+            logger.warning("Error loading inventory snapshot %s; fetching the inventory: %s", snapshot_path, e)
+            snapshot_path = None
+    if not snapshot_path:
+        fetched_at = datetime.now(timezone.utc)
+        previous = find_latest_snapshot(subscription_ids, args.snapshot_dir, source) if args.incremental else None
+        complete = True
+        snapshot = None
+        if previous and snapshot_age_hours(previous) < RESOURCE_CHANGES_RETENTION_DAYS * 24:
+            try:
+                with metrics.step('load snapshot'):
+                    all_resources, network_details, snapshot = load_snapshot(previous)
+            except SNAPSHOT_ERRORS as e:
+                logger.warning("Error loading inventory snapshot %s; fetching the full inventory: %s", previous, e)
+        if snapshot is not None:
+            since = snapshot.get('fetched_at', snapshot['created'])
+            try:
+                with metrics.step('changes'):
+                    graph_info = load_resource_graph_data(subscription_ids, fixture=args.graph_fixture, token_cache=args.token_cache,
+                                                          base_url=args.arm_base_url)
+                    all_resources, network_details = fetch_incremental_inventory(graph_info, all_resources, network_details, since, args.enrich)
+            except Exception as e:
+                logger.error("Error fetching incremental changes since %s; fetching the full inventory: %s", since, e)
+                all_resources, network_details, fetched_at, complete = collect_inventory_checkpointed(args, subscription_ids, fetched_at,
+                                                                                                      spooler, metrics)
+        else:
+            if args.incremental:
+                logger.warning("No usable snapshot recent enough for an incremental run; fetching the full inventory.")
+            all_resources, network_details, fetched_at, complete = collect_inventory_checkpointed(args, subscription_ids, fetched_at,
+                                                                                                  spooler, metrics)
+        if complete:
+            with metrics.step('save snapshot'):
+                save_snapshot(subscription_ids, all_resources, network_details, args.snapshot_dir, fetched_at=fetched_at, source=source)
+        else:
+            logger.warning("Not saving a snapshot of an incomplete inventory.")
+
+    return all_resources, network_details
+
+def main(argv=None):
+    """Run the As-Built pipeline: collect, process and render the inventory."""
+    args = parse_args(argv)
+    log_levels = dict(args.log_levels or [])
+    configure_logging(log_levels.pop('', LOG_LEVEL), args.log_file, args.log_json, log_levels)
+    try:
+        run(args)
+    finally:
+        stop_logging()
+
+def run_report(args, subscription_ids, metrics, counts, paths, started, wall_seconds):
+    """Return the report of a run: its stages and steps, the fetch counters of each subscription and the outputs."""
+    resources = sum(counts.get("dimensions", {}).get("type", {}).values())
+    collect_seconds = metrics.wall_seconds('collect')
+    return {
+        "version": RUN_REPORT_VERSION,
+        "started": started.isoformat(),
+        "finished": datetime.now(timezone.utc).isoformat(),
+        "wall_seconds": wall_seconds,
+        "backend": 'graph' if args.graph_fixture else args.backend,
+        "subscriptions": subscription_ids,
+        "resources": resources,
+        "resources_per_second": resources / collect_seconds if collect_seconds else None,
+        "counts": {key: counts[key] for _, key in COUNT_LABELS},
+        "outputs": paths,
+        "stages": metrics.stages,
+        "steps": metrics.steps,
+        "fetch": fetch_metrics().report(),
+        "http": http_connection_metrics(),
+    }
+
+def run(args):
+    """Collect, process and render the inventory for parsed command line arguments."""
+    logger.info("Starting the As-Built Document generation process.")
+    started, start = datetime.now(timezone.utc), time.perf_counter()
+    subscription_ids = args.subscription_ids or os.getenv('AZURE_SUBSCRIPTION_IDS', '5514d116-97eb-4cfc-927f-b03826fcc9cc').split(',')
+
+    # Pager pages -> records spooled by type -> sections that stream their rows -> renderers
+    metrics = StageMetrics()
+    fetch_metrics().clear()
+    with Spooler() as spooler:
+        if args.from_dataset:
+            with metrics.stage('collect'):
+                table = read_inventory_dataset(args.from_dataset)
+            with metrics.stage('process'):
+                sections, counts = process_inventory_table(table)
+        else:
+            with metrics.stage('collect'):
+                all_resources, network_details = load_inventory(args, subscription_ids, spooler, metrics)
+            with metrics.stage('process'):
+                if args.columnar:
+                    table = resources_to_table(all_resources, network_details)
+                    write_inventory_dataset(table, args.columnar)
+                    sections, counts = process_inventory_table(table)
+                else:
+                    sections, counts = process_resource_data(all_resources, network_details)
+
+        formats = list(dict.fromkeys(args.formats or ['docx']))
+        paths = render_outputs(sections, counts, formats, args.output, stream_docx=args.stream_docx,
+                               render_workers=args.render_workers, metrics=metrics)
+    metrics.log_summary()
+
+    report = run_report(args, subscription_ids, metrics, counts, paths, started, time.perf_counter() - start)
+    report_path = f"{args.output}.run.json" if args.run_report is None else args.run_report
+    if report_path:
+        write_run_report(report_path, report)
+        logger.info("Run report saved as %s", report_path)
+    if args.prometheus_textfile:
+        write_prometheus_textfile(args.prometheus_textfile, report)
+    if args.timings:
+        print(format_timings(report))
+    logger.info("As-Built Document generation process completed.")
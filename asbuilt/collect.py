@@ -0,0 +1,294 @@
+"""Fetch resources and virtual networks from ARM, with resumable paging and checkpoints."""
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime, timezone
+from itertools import repeat
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from .records import ResourceRecord
+from .session import (ARM_BASE_URL, ARM_THROTTLE_BACKOFF, ArmThrottle, ArmThrottlingPolicy, FETCH_MAX_WORKERS, RequestMetricsPolicy, _retry_after,
+                      http_transport, management_client_options)
+from .metrics import fetch_metrics
+from .snapshot import SNAPSHOT_DIR, SNAPSHOT_VERSION, snapshot_key
+# The Azure SDKs are imported by the functions that use them
+
+logger = logging.getLogger(__name__)
+
+ARM_PAGE_ATTEMPTS = 5  # Times a throttled page is resumed after the SDK's own retries
+
+def pages_with_resume(list_operation, description, continuation_token=None, attempts=ARM_PAGE_ATTEMPTS, subscription_id=None):
+    """Yield (items, next continuation token) for each page of a paged list operation.
+
+    When a page still fails with a throttling status after the SDK's own retries,
+    the listing waits and carries on from the page that failed instead of restarting.
+    Passing a continuation token starts the listing at that page. The token is
+    None after the last page. Resumes and their waits are counted in fetch_metrics()
+    under subscription_id.
+    """
+    from azure.core.exceptions import HttpResponseError
+    attempt = 0
+    while True:
+        pages = list_operation().by_page(continuation_token=continuation_token)
+        try:
+            for page in pages:
+                items = list(page)
+                continuation_token = pages.continuation_token
+                attempt = 0
+                yield items, continuation_token
+            return
+        except HttpResponseError as e:
+            if e.status_code not in (429, 503) or attempt >= attempts:
+                raise
+            attempt += 1
+            delay = (e.response is not None and _retry_after(e.response.headers)) or ARM_THROTTLE_BACKOFF * 2 ** attempt
+            logger.warning("%s throttled (%s); resuming from the last page in %gs (attempt %s of %s).",
+                           description, e.status_code, delay, attempt, attempts)
+            fetch_metrics().add(subscription_id.lower() if subscription_id else 'tenant', retries=1, throttle_wait_seconds=delay)
+            time.sleep(delay)
+
+def list_with_resume(list_operation, description, attempts=ARM_PAGE_ATTEMPTS, subscription_id=None):
+    """Yield the items of a paged list operation, resuming throttled pages as pages_with_resume does."""
+    for items, _ in pages_with_resume(list_operation, description, attempts=attempts, subscription_id=subscription_id):
+        yield from items
+
+def checkpoint_path(subscription_ids, directory=SNAPSHOT_DIR, source=None):
+    """Return the path of the fetch checkpoint for a set of subscription IDs and a source."""
+    return os.path.join(directory, f"{snapshot_key(subscription_ids, source)}-checkpoint.jsonl")
+
+class FetchCheckpoint:
+    """Append-only log of the pages fetched so far, so an interrupted fetch can resume.
+
+    The first line records when the fetch started. Each later line is one page of
+    a subscription's resources with the continuation token of the next page (a
+    page without one completes the subscription), or a subscription's VNets.
+    Lines are flushed as they are written, and a line cut short by a crash is
+    ignored on load.
+    """
+
+    def __init__(self, path, started):
+        self.path = path
+        self.started = started
+        self.resources = {}  # Subscription ID -> records fetched so far
+        self.tokens = {}  # Subscription ID -> continuation token of the next page, None once complete
+        self.vnets = {}  # Subscription ID -> vnet_details dicts
+        self.lock = threading.Lock()
+        self.file = None
+
+    @classmethod
+    def start(cls, path):
+        """Start a new checkpoint, replacing any left by a previous fetch."""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        checkpoint = cls(path, datetime.now(timezone.utc))
+        checkpoint.file = open(path, 'w', encoding='utf-8')
+        checkpoint._write({"version": SNAPSHOT_VERSION, "started": checkpoint.started.isoformat()})
+        return checkpoint
+
+    @classmethod
+    def load(cls, path):
+        """Replay a checkpoint and reopen it to append the rest of the fetch."""
+        with open(path, encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        header = json.loads(lines[0])
+        if header.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported checkpoint version {header.get('version')} in {path}")
+        checkpoint = cls(path, datetime.fromisoformat(header["started"]))
+        for line in lines[1:]:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                logger.warning("Ignoring a partly written line in checkpoint %s.", path)
+                continue
+            sub_id = entry["subscription_id"]
+            if "vnets" in entry:
+                checkpoint.vnets[sub_id] = entry["vnets"]
+            else:
+                checkpoint.resources.setdefault(sub_id, []).extend(ResourceRecord.from_dict(resource) for resource in entry["resources"])
+                checkpoint.tokens[sub_id] = entry["continuation_token"]
+        checkpoint.file = open(path, 'a', encoding='utf-8')
+        logger.info("Resuming from checkpoint %s: %s subscriptions complete, %s resources fetched.", path,
+                    len(checkpoint.completed_subscriptions()), sum(len(records) for records in checkpoint.resources.values()))
+        return checkpoint
+
+    def _write(self, entry):
+        with self.lock:
+            self.file.write(json.dumps(entry, separators=(',', ':')) + '\n')
+            self.file.flush()
+
+    def resource_state(self, sub_id):
+        """Return (records fetched, continuation token, complete) for a subscription."""
+        return self.resources.get(sub_id, []), self.tokens.get(sub_id), sub_id in self.tokens and self.tokens[sub_id] is None
+
+    def add_page(self, sub_id, records, continuation_token):
+        """Record a fetched page of a subscription's resources."""
+        self._write({"subscription_id": sub_id, "resources": [record.to_dict() for record in records],
+                     "continuation_token": continuation_token})
+        self.tokens[sub_id] = continuation_token
+
+    def add_vnets(self, sub_id, vnets):
+        """Record the complete VNet listing of a subscription."""
+        self._write({"subscription_id": sub_id, "vnets": vnets})
+        self.vnets[sub_id] = vnets
+
+    def completed_subscriptions(self):
+        return {sub_id for sub_id, token in self.tokens.items() if token is None}
+
+    def close(self, remove=False):
+        self.file.close()
+        if remove:
+            os.remove(self.path)
+
+def load_azure_data(subscription_ids, token_cache=None, base_url=ARM_BASE_URL):
+    """Load data from Azure for given subscription IDs, or from the ARM endpoint at base_url."""
+    logger.info("Loading Azure data for subscription IDs%s.", f" from {base_url}" if base_url else '')
+    from azure.mgmt.resource import ResourceManagementClient
+    from azure.mgmt.network import NetworkManagementClient
+    # Resolve the credential and fetch the ARM token before the clients fan out
+    credential, endpoint = management_client_options(base_url, token_cache)
+    # One throttle and one transport for every client, so parallel fetches share the quotas and the connection pool
+    options = {"per_retry_policies": [RequestMetricsPolicy(), ArmThrottlingPolicy(ArmThrottle())], "transport": http_transport(), **endpoint}
+    resource_clients = [{"client": ResourceManagementClient(credential, sub_id, **options), "subscription_id": sub_id}
+                        for sub_id in subscription_ids]
+    network_clients = [{"client": NetworkManagementClient(credential, sub_id, **options), "subscription_id": sub_id}
+                       for sub_id in subscription_ids]
+    return resource_clients, network_clients
+
+def fetch_subscription_resources(client_info, checkpoint=None, spooler=None):
+    """Fetch all resources for a single subscription client and organize them by type.
+
+    With a checkpoint, each page is recorded as it arrives, and a subscription the
+    checkpoint already has is continued from its last page, or not fetched at all.
+    With a spooler, each type's records go to the spool it returns for the type,
+    which keeps a bounded number in memory, instead of a list. The pages, resources
+    and time of the listing are counted in fetch_metrics().
+    """
+    client = client_info["client"]
+    sub_id = client_info["subscription_id"]
+    sub_resources = {}
+    new_list = spooler or (lambda resource_type: [])
+    continuation_token, complete = None, False
+    fetched = 0
+    if checkpoint:
+        records, continuation_token, complete = checkpoint.resource_state(sub_id)
+        for record in records:
+            if record.type not in sub_resources:
+                sub_resources[record.type] = new_list(record.type)
+            sub_resources[record.type].append(record)
+        fetched = len(records)
+        if complete:
+            logger.info("Using %s checkpointed resources for subscription ID %s.", len(records), sub_id)
+            return sub_resources
+    metrics = fetch_metrics()
+    start = time.perf_counter()
+    try:
+        logger.info("Fetching resources for client with subscription ID %s.", sub_id)
+        pages = pages_with_resume(client.resources.list, f"Resource listing for subscription {sub_id}", continuation_token,
+                                  subscription_id=sub_id)
+        for page, continuation_token in pages:
+            records = [ResourceRecord.from_model(resource) for resource in page]
+            metrics.add(sub_id.lower(), pages=1, items=len(records))
+            for record in records:
+                resource_type = record.type
+                if resource_type not in sub_resources:
+                    sub_resources[resource_type] = new_list(resource_type)
+                sub_resources[resource_type].append(record)
+            fetched += len(records)
+            if checkpoint:
+                checkpoint.add_page(sub_id, records, continuation_token)
+    except Exception as e:
+        logger.error("Error fetching data for client with subscription ID %s; its inventory is incomplete after %s resources: %s",
+                     sub_id, fetched, e)
+    finally:
+        metrics.add(sub_id.lower(), seconds=time.perf_counter() - start)
+    return sub_resources
+
+def fetch_resources(resource_clients, max_workers=FETCH_MAX_WORKERS, checkpoint=None, spooler=None):
+    """Fetch all resources for given clients in parallel and organize them by type.
+
+    With a spooler, every subscription appends to one spool per type, so the records
+    in memory are bounded per type however many subscriptions are fetched. The
+    records of a type are then in the order their pages arrived. Either way, types
+    are listed in the order of the subscriptions that first returned them.
+    """
+    if not resource_clients:
+        return {}
+    spools = {}
+    lock = threading.Lock()
+
+    def shared_spool(resource_type):
+        with lock:
+            if resource_type not in spools:
+                spools[resource_type] = spooler(resource_type)
+            return spools[resource_type]
+
+    workers = max(1, min(max_workers, len(resource_clients)))
+    fetched = [None] * len(resource_clients)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='fetch') as executor:
+        futures = {executor.submit(fetch_subscription_resources, client_info, checkpoint, spooler and shared_spool): n
+                   for n, client_info in enumerate(resource_clients)}
+        for future in as_completed(futures):
+            fetched[futures[future]] = future.result()
+
+    all_resources = {}
+    for sub_resources in fetched:
+        for resource_type, resource_list in sub_resources.items():
+            if spooler:
+                all_resources.setdefault(resource_type, resource_list)
+            else:
+                all_resources.setdefault(resource_type, []).extend(resource_list)
+    return all_resources
+
+def vnet_details(vnet):
+    """Extract the address prefixes, subnets and peerings of a VNet from its as_dict() form."""
+    return {
+        "id": vnet.get('id', 'N/A'),
+        "name": vnet.get('name', 'N/A'),
+        "location": vnet.get('location', 'N/A'),
+        "address_prefixes": vnet.get('address_space', {}).get('address_prefixes', []),
+        "subnets": [
+            {
+                "name": subnet.get('name', 'N/A'),
+                "address_prefixes": subnet.get('address_prefixes') or ([subnet['address_prefix']] if subnet.get('address_prefix') else []),
+            }
+            for subnet in vnet.get('subnets', [])
+        ],
+        "peerings": [
+            {
+                "name": peering.get('name', 'N/A'),
+                "remote_virtual_network": peering.get('remote_virtual_network', {}).get('id', 'N/A'),
+                "peering_state": peering.get('peering_state', 'N/A'),
+            }
+            for peering in vnet.get('virtual_network_peerings', [])
+        ],
+    }
+
+def fetch_subscription_network_details(client_info, checkpoint=None):
+    """Fetch VNet details for a single subscription client."""
+    client = client_info["client"]
+    sub_id = client_info["subscription_id"]
+    if checkpoint and sub_id in checkpoint.vnets:
+        return sub_id, checkpoint.vnets[sub_id]
+    vnets = []
+    try:
+        logger.info("Fetching network details for client with subscription ID %s.", sub_id)
+        for vnet in list_with_resume(client.virtual_networks.list_all, f"VNet listing for subscription {sub_id}", subscription_id=sub_id):
+            vnets.append(vnet_details(vnet.as_dict()))
+        if checkpoint:
+            checkpoint.add_vnets(sub_id, vnets)
+    except Exception as e:
+        logger.error("Error fetching network details for client with subscription ID %s; %s VNets were fetched: %s",
+                     sub_id, len(vnets), e)
+    return sub_id, vnets
+
+def fetch_network_details(network_clients, max_workers=FETCH_MAX_WORKERS, checkpoint=None):
+    """Fetch details for specific network resources like VNets, in parallel, keyed by subscription."""
+    virtual_networks = {}
+    network_details = {'virtualNetworks': virtual_networks}
+    if not network_clients:
+        return network_details
+    workers = max(1, min(max_workers, len(network_clients)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='network') as executor:
+        for sub_id, vnets in executor.map(fetch_subscription_network_details, network_clients, repeat(checkpoint)):
+            virtual_networks[sub_id] = vnets
+    return network_details
@@ -0,0 +1,204 @@
+"""Columnar inventory: Arrow tables, partitioned Parquet datasets and vectorised processing."""
+import os
+import glob
+import shutil
+import logging
+from collections import Counter
+from .records import ResourceRecord
+from .process import COUNT_DIMENSIONS, COUNT_LABELS, headline_counts, service_section, type_headers, vnet_address_prefixes
+# pyarrow is imported by the functions that use it
+
+logger = logging.getLogger(__name__)
+
+TABLE_BATCH = 5000  # Rows of a section turned into records at a time when it is rendered
+
+# Columns that become record attributes as they are; the map columns are read by map_dicts
+STRING_COLUMNS = ('id', 'name', 'type', 'resource_group', 'location', 'kind', 'sku', 'subscription_id')
+
+# Section header -> table column; the other headers are keys of the details map
+HEADER_COLUMNS = {**ResourceRecord.HEADER_FIELDS, "Address Space": 'address_space'}
+
+def _import_pyarrow():
+    """Import pyarrow, which the columnar inventory needs but the rest of the script does not."""
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.dataset
+    except ImportError:
+        raise SystemExit("The columnar inventory requires pyarrow: pip install pyarrow")
+    return pyarrow
+
+def inventory_schema(pa):
+    """Return the Arrow schema of the columnar inventory."""
+    return pa.schema([
+        ('id', pa.string()),
+        ('name', pa.string()),
+        ('type', pa.string()),
+        ('subscription_id', pa.string()),
+        ('resource_group', pa.string()),
+        ('location', pa.string()),
+        ('kind', pa.string()),
+        ('sku', pa.string()),
+        ('tags', pa.map_(pa.string(), pa.string())),
+        ('address_space', pa.string()),
+        ('details', pa.map_(pa.string(), pa.string())),  # Enricher columns such as "Size" or "Access Tier"
+        ('ordinal', pa.int64()),  # Position in the inventory, which partitioning does not keep
+    ])
+
+def resources_to_table(resources, network_details):
+    """Land the fetched resources in an Arrow table, one row per resource."""
+    pa = _import_pyarrow()
+    schema = inventory_schema(pa)
+    columns = {name: [] for name in schema.names}
+    vnet_prefixes = vnet_address_prefixes(network_details)
+    for resource_type, resource_list in resources.items():
+        for resource in resource_list:
+            columns['ordinal'].append(len(columns['ordinal']))
+            columns['id'].append(resource.id)
+            columns['name'].append(resource.name)
+            columns['type'].append(resource_type)
+            columns['subscription_id'].append(resource.subscription_id)
+            columns['resource_group'].append(resource.resource_group)
+            columns['location'].append(resource.location)
+            columns['kind'].append(resource.kind)
+            columns['sku'].append(resource.sku)
+            columns['tags'].append([(k, str(v)) for k, v in resource.tags.items()] if resource.tags else None)
+            if resource_type == "Microsoft.Network/virtualNetworks":
+                columns['address_space'].append(', '.join(vnet_prefixes.get(resource.id.lower(), [])) or None)
+            else:
+                columns['address_space'].append(resource.get("Address Space", None))
+            details = [(k, v) for k, v in resource.extras.items() if k != "Address Space" and v is not None] if resource.extras else None
+            columns['details'].append(details or None)
+    return pa.table(columns, schema=schema)
+
+def _inventory_partitioning(pa):
+    """Hive partitioning by subscription and resource type; '/' in types is URI-encoded."""
+    return pa.dataset.partitioning(
+        pa.schema([('subscription_id', pa.string()), ('type', pa.string())]), flavor='hive')
+
+def write_inventory_dataset(table, directory):
+    """Write the inventory table as a Parquet dataset partitioned by subscription and resource type."""
+    pa = _import_pyarrow()
+    # Replace the partitions of a previous run so removed resource types do not linger
+    for old_partition in glob.glob(os.path.join(directory, 'subscription_id=*')):
+        shutil.rmtree(old_partition)
+    pa.dataset.write_dataset(table, directory, format='parquet', partitioning=_inventory_partitioning(pa),
+                             existing_data_behavior='overwrite_or_ignore')
+    logger.info("Columnar inventory of %s resources written to %s", table.num_rows, directory)
+
+def read_inventory_dataset(directory):
+    """Read a Parquet inventory dataset written by write_inventory_dataset, in the order it was written."""
+    pa = _import_pyarrow()
+    dataset = pa.dataset.dataset(directory, format='parquet', partitioning=_inventory_partitioning(pa))
+    schema = inventory_schema(pa)
+    table = dataset.to_table()
+    # Datasets written before a column was added get it as all nulls
+    for field in schema:
+        if field.name not in table.column_names:
+            table = table.append_column(field, pa.nulls(table.num_rows, field.type))
+    table = table.select(schema.names)
+    # Partitions are read in directory order, so restore the order of the inventory that was written
+    if table['ordinal'].null_count < table.num_rows:
+        table = table.sort_by('ordinal')
+    logger.info("Loaded columnar inventory of %s resources from %s", table.num_rows, directory)
+    return table
+
+def map_dicts(array):
+    """Return a map array's rows as dicts, None for empty maps, from its keys and items sliced by the offsets."""
+    offsets = array.offsets.to_pylist()
+    start, end = offsets[0], offsets[-1]
+    keys = array.keys.slice(start, end - start).to_pylist()
+    items = array.items.slice(start, end - start).to_pylist()
+    return [dict(zip(keys[a - start:b - start], items[a - start:b - start])) or None for a, b in zip(offsets, offsets[1:])]
+
+class TableRecords:
+    """One resource type's rows of the inventory table, read like the list of ResourceRecords they replace.
+
+    The rows are a zero-copy slice of the table. They become records a batch at a
+    time, from each column's values, only when the section is rendered.
+    """
+
+    def __init__(self, table):
+        self.table = table
+
+    def batches(self):
+        """Yield the rows as lists of ResourceRecords, TABLE_BATCH at a time."""
+        for rows in self.table.to_batches(max_chunksize=TABLE_BATCH):
+            columns = {name: rows.column(name).to_pylist() for name in STRING_COLUMNS}
+            if rows.column('address_space').null_count + rows.column('details').null_count < 2 * rows.num_rows:
+                extras = [dict(detail or (), **({"Address Space": address_space} if address_space else {})) or None
+                          for address_space, detail in zip(rows.column('address_space').to_pylist(),
+                                                            map_dicts(rows.column('details')))]
+            else:
+                extras = [None] * rows.num_rows
+            yield ResourceRecord.from_columns(
+                columns['id'], columns['name'], columns['type'], columns['resource_group'], columns['location'],
+                columns['kind'], columns['sku'], map_dicts(rows.column('tags')), extras, columns['subscription_id'],
+            )
+
+    def __iter__(self):
+        for batch in self.batches():
+            yield from batch
+
+    def __len__(self):
+        return self.table.num_rows
+
+def table_column_occupancy(pa, headers, rows):
+    """Return the column occupancy bitmap of process.column_occupancy from the null counts of a table's columns."""
+    pc = pa.compute
+    occupied = 0
+    for bit, header in enumerate(headers):
+        column = HEADER_COLUMNS.get(header)
+        if column is not None:
+            values = rows[column]
+        elif rows.num_rows and rows['details'].null_count < rows.num_rows:
+            values = pc.map_lookup(rows['details'], header, 'first')
+        else:
+            continue
+        if values.null_count < rows.num_rows:
+            occupied |= 1 << bit
+    return occupied
+
+def type_slices(pa, table):
+    """Return {resource type: zero-copy slice of its rows}, in order of first appearance.
+
+    The table is sorted by type once, with a stable sort so each type keeps its
+    row order. A table that is already grouped by type, as resources_to_table and
+    the ordinal order of a dataset leave it, is sliced as it is.
+    """
+    pc = pa.compute
+    types = table['type']
+    first_seen = pc.unique(types).to_pylist()
+    if table.num_rows > 1 and pc.sum(pc.not_equal(types[1:], types[:-1])).as_py() + 1 > len(first_seen):
+        table = table.take(pc.sort_indices(types))
+        grouped = sorted(first_seen)
+    else:
+        grouped = first_seen
+    sizes = {item['values']: item['counts'] for item in pc.value_counts(types).to_pylist()}
+    slices, offset = {}, 0
+    for resource_type in grouped:
+        slices[resource_type] = table.slice(offset, sizes[resource_type])
+        offset += sizes[resource_type]
+    return {resource_type: slices[resource_type] for resource_type in first_seen}
+
+def process_inventory_table(table):
+    """Build the sections and counts of process_resource_data with vectorised Arrow operations."""
+    pa = _import_pyarrow()
+    pc = pa.compute
+    dimensions = {}
+    for key, _, _, field in COUNT_DIMENSIONS:
+        if field == 'tags':
+            column = pa.chunked_array([chunk.keys for chunk in table['tags'].chunks], type=pa.string())
+        else:
+            column = table[field]
+        value_counts = pc.value_counts(column).to_pylist()
+        dimensions[key] = Counter({item['values']: item['counts'] for item in value_counts})
+    counts = headline_counts(dimensions)
+
+    sections = []
+    for resource_type, rows in type_slices(pa, table).items():
+        columns = table_column_occupancy(pa, type_headers(resource_type), rows)
+        sections.append(service_section(resource_type, TableRecords(rows), columns))
+
+    logger.info("Processed columnar resource data: %s", ', '.join(f'{key}: {counts[key]}' for _, key in COUNT_LABELS))
+    return sections, counts
@@ -0,0 +1,325 @@
+"""Local stand-in for Azure Resource Manager that serves a synthetic or recorded estate over HTTP.
+
+    python -m asbuilt.fake_arm --resources 100000 --subscriptions 10 --latency 0.05 --throttle-rate 0.05
+
+prints the `asbuilt --arm-base-url http://127.0.0.1:PORT ...` command that fetches
+from it. The server answers the requests of an As-Built run:
+
+- GET /subscriptions/{id}/resources: resources.list(), in pages of page_size.
+- GET /subscriptions/{id}/providers/Microsoft.Network/virtualNetworks: virtual_networks.list_all().
+- POST /providers/Microsoft.ResourceGraph/resources: Resource Graph queries, answered by FixtureResourceGraphClient.
+"""
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import threading
+import subprocess
+from collections import Counter
+from urllib.parse import parse_qs, urlencode, urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from .graph import canonical_resource_type
+from .synthetic import SyntheticEstate
+# The Resource Graph SDK is imported by the first Resource Graph query
+
+logger = logging.getLogger(__name__)
+
+VNET_TYPE = "Microsoft.Network/virtualNetworks"
+
+# Fields resources.list() returns; properties are only returned by the VNet listing and Resource Graph
+ARM_LISTING_FIELDS = ('id', 'name', 'type', 'location', 'kind', 'sku', 'tags', 'managedBy', 'identity', 'plan', 'extendedLocation')
+
+class RecordedEstate:
+    """An estate recorded as Resource Graph rows, such as a --graph-fixture file, served like a SyntheticEstate."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        subscriptions = {}
+        for row in rows:
+            subscriptions.setdefault(row['id'].split('/')[2], []).append(row)
+        self.subscription_ids = list(subscriptions)
+        self.subscriptions = len(self.subscription_ids)
+        self._rows = list(subscriptions.values())
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, encoding='utf-8') as f:
+            fixture = json.load(f)
+        return cls(fixture['rows'] if isinstance(fixture, dict) else fixture)
+
+    def subscription_resource_count(self, subscription):
+        return len(self._rows[subscription])
+
+    def subscription_resources(self, subscription, start=0, stop=None):
+        # Resource Graph lower-cases types; resources.list() returns the ARM casing
+        for row in self._rows[subscription][start:stop]:
+            yield {**row, "type": canonical_resource_type(row['type'])}
+
+    def virtual_networks(self, subscription):
+        return [resource for resource in self.subscription_resources(subscription) if resource['type'] == VNET_TYPE]
+
+    def graph_rows(self):
+        return iter(self.rows)
+
+class FakeArmServer(ThreadingHTTPServer):
+    """A threaded HTTP server answering ARM list and Resource Graph requests for an estate.
+
+    Every page waits `latency` seconds. A request is throttled (429) with
+    probability throttle_rate and unavailable (503) with probability
+    unavailable_rate, both with a Retry-After of retry_after seconds. The k-th
+    request for a URL draws its fault from the seed, the URL and k alone, so a run
+    meets the same faults whatever the order of its threads. With reads_rate, each
+    subscription also has an ARM-style read quota: a token bucket of reads_burst
+    requests refilled at reads_rate per second, reported in the
+    x-ms-ratelimit-remaining-subscription-reads header and answered with 429 when empty.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, estate, address=('127.0.0.1', 0), page_size=1000, latency=0.0, throttle_rate=0.0, unavailable_rate=0.0,
+                 retry_after=1.0, reads_rate=None, reads_burst=250, seed=0):
+        super().__init__(address, FakeArmHandler)
+        self.estate = estate
+        self.page_size = max(1, page_size)
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.unavailable_rate = unavailable_rate
+        self.retry_after = retry_after
+        self.reads_rate = reads_rate
+        self.reads_burst = reads_burst
+        self.seed = seed
+        self.subscription_index = {sub_id.lower(): n for n, sub_id in enumerate(estate.subscription_ids)}
+        self.stats = Counter()
+        self.attempts = Counter()  # URL -> requests for it so far
+        self.buckets = {}  # Subscription ID -> (tokens, time of the last refill)
+        self.lock = threading.Lock()
+        self.thread = None
+        self._graph_client = None
+        self._vnets = {}
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Serve requests on a background thread."""
+        self.thread = threading.Thread(target=self.serve_forever, name='fake-arm', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def count(self, key, n=1):
+        with self.lock:
+            self.stats[key] += n
+
+    def fault(self, url):
+        """Return 429 or 503 if the next request for a URL is to fail, else None."""
+        with self.lock:
+            attempt = self.attempts[url]
+            self.attempts[url] += 1
+        draw = random.Random(f"{self.seed}:{url}:{attempt}").random()
+        if draw < self.throttle_rate:
+            return 429
+        if draw < self.throttle_rate + self.unavailable_rate:
+            return 503
+        return None
+
+    def take_read(self, sub_id):
+        """Take a read from a subscription's quota; return (reads remaining, seconds until the next one if there was none)."""
+        if self.reads_rate is None:
+            return None, 0
+        now = time.monotonic()
+        with self.lock:
+            tokens, updated = self.buckets.get(sub_id, (self.reads_burst, now))
+            tokens = min(self.reads_burst, tokens + (now - updated) * self.reads_rate)
+            if tokens < 1:
+                self.buckets[sub_id] = (tokens, now)
+                return 0, (1 - tokens) / self.reads_rate
+            self.buckets[sub_id] = (tokens - 1, now)
+            return int(tokens - 1), 0
+
+    def virtual_networks(self, subscription):
+        with self.lock:
+            if subscription not in self._vnets:
+                self._vnets[subscription] = self.estate.virtual_networks(subscription)
+            return self._vnets[subscription]
+
+    def graph_client(self):
+        """Return the FixtureResourceGraphClient over the estate's rows, built on the first query."""
+        with self.lock:
+            if self._graph_client is None:
+                from .fake_resource_graph import FixtureResourceGraphClient
+                self._graph_client = FixtureResourceGraphClient(list(self.estate.graph_rows()))
+            return self._graph_client
+
+class FakeArmProcess:
+    """Runs `python -m asbuilt.fake_arm` with the given options in a child process; entering it returns the URL.
+
+    Benchmarks serve their estate this way so that the server's memory and CPU are
+    not counted as the fetch's.
+    """
+
+    def __init__(self, *options):
+        self.options = [str(option) for option in options]
+        self.process = None
+
+    def __enter__(self):
+        package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = {**os.environ, 'PYTHONPATH': os.pathsep.join(filter(None, [package_root, os.getenv('PYTHONPATH')]))}
+        self.process = subprocess.Popen([sys.executable, '-m', 'asbuilt.fake_arm', *self.options], stdout=subprocess.PIPE,
+                                        stderr=subprocess.DEVNULL, text=True, env=env)
+        url = self.process.stdout.readline().strip()
+        if not url:
+            self.process.wait()
+            raise RuntimeError(f"The fake ARM server exited with status {self.process.returncode} before serving.")
+        return url
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        self.process.wait()
+        self.process.stdout.close()
+
+class FakeArmHandler(BaseHTTPRequestHandler):
+    """Answers one connection's requests for a FakeArmServer; connections are kept alive as ARM's are."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        logger.debug("%s %s", self.address_string(), format % args)
+
+    def do_GET(self):
+        self.handle_request()
+
+    def do_POST(self):
+        self.handle_request()
+
+    def send_json(self, status, body, headers=None):
+        data = json.dumps(body, separators=(',', ':')).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        for header, value in (headers or {}).items():
+            self.send_header(header, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_error_json(self, status, code, message, headers=None):
+        self.send_json(status, {"error": {"code": code, "message": message}}, headers)
+
+    def handle_request(self):
+        server = self.server
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        segments = [segment for segment in url.path.split('/') if segment]
+        server.count('requests')
+
+        if self.command == 'POST' and [segment.lower() for segment in segments] == ['providers', 'microsoft.resourcegraph', 'resources']:
+            kind, sub_id = 'graph', None
+        elif self.command == 'GET' and len(segments) >= 3 and segments[0].lower() == 'subscriptions':
+            sub_id = segments[1].lower()
+            rest = '/'.join(segments[2:]).lower()
+            kind = {'resources': 'resources', 'providers/microsoft.network/virtualnetworks': 'vnets'}.get(rest)
+            if kind and sub_id not in server.subscription_index:
+                server.count('not found')
+                return self.send_error_json(404, 'SubscriptionNotFound', f"The subscription '{segments[1]}' could not be found.")
+        else:
+            kind = None
+        if kind is None:
+            server.count('not found')
+            return self.send_error_json(404, 'NotFound', f"{self.command} {url.path} is not served by the fake ARM server.")
+
+        headers = {"x-ms-request-id": f"fake-{server.stats['requests']}"}
+        if sub_id:
+            remaining, wait = server.take_read(sub_id)
+            if remaining is not None:
+                headers['x-ms-ratelimit-remaining-subscription-reads'] = str(remaining)
+            if wait:
+                server.count('quota exceeded')
+                return self.send_error_json(429, 'SubscriptionRequestsThrottled', "Number of read requests exceeded the limit.",
+                                            {**headers, 'Retry-After': str(max(1, round(wait)))})
+        status = server.fault(f"{self.command} {self.path} {body.decode(errors='replace')}")
+        if status:
+            server.count('throttled' if status == 429 else 'unavailable')
+            code, message = (('TooManyRequests', "The request was throttled.") if status == 429 else
+                             ('ServiceUnavailable', "The service is temporarily unavailable."))
+            return self.send_error_json(status, code, message, {**headers, 'Retry-After': f"{server.retry_after:g}"})
+        if server.latency:
+            time.sleep(server.latency)
+
+        if kind == 'graph':
+            from azure.mgmt.resourcegraph.models import QueryRequest
+            response = server.graph_client().resources(QueryRequest.deserialize(json.loads(body)))
+            server.count('graph pages')
+            return self.send_json(200, response.serialize(), headers)
+
+        subscription = server.subscription_index[sub_id]
+        start = int(query.get('$skiptoken', ['0'])[0])
+        stop = start + server.page_size
+        if kind == 'resources':
+            total = server.estate.subscription_resource_count(subscription)
+            items = [{field: resource[field] for field in ARM_LISTING_FIELDS if resource.get(field) is not None}
+                     for resource in server.estate.subscription_resources(subscription, start, stop)]
+        else:
+            vnets = server.virtual_networks(subscription)
+            total, items = len(vnets), vnets[start:stop]
+        server.count(f"{kind} pages")
+        server.count(f"{kind} items", len(items))
+        page = {"value": items}
+        if stop < total:
+            next_query = urlencode({**{key: values[0] for key, values in query.items()}, '$skiptoken': stop})
+            page["nextLink"] = f"{server.url}{url.path}?{next_query}"
+        self.send_json(200, page, headers)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m asbuilt.fake_arm',
+                                     description="Serve a synthetic or recorded estate as a local stand-in for Azure Resource Manager.")
+    parser.add_argument('--fixture', metavar='FILE', help="Serve a recorded estate from a Resource Graph fixture instead of a synthetic one.")
+    parser.add_argument('--resources', type=int, default=10000, help="Resources in the synthetic estate (default: 10000).")
+    parser.add_argument('--subscriptions', type=int, default=10, help="Subscriptions in the synthetic estate (default: 10).")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the synthetic estate and of the injected faults (default: 0).")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=0, help="Port to listen on (default: a free port).")
+    parser.add_argument('--page-size', type=int, default=1000, help="Resources or VNets per page (default: 1000).")
+    parser.add_argument('--latency', type=float, default=0.0, metavar='SECONDS', help="Delay before each page (default: 0).")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, metavar='P', help="Share of requests answered with 429 (default: 0).")
+    parser.add_argument('--unavailable-rate', type=float, default=0.0, metavar='P', help="Share of requests answered with 503 (default: 0).")
+    parser.add_argument('--retry-after', type=float, default=1.0, metavar='SECONDS',
+                        help="Retry-After of the injected 429 and 503 responses (default: 1).")
+    parser.add_argument('--reads-rate', type=float, metavar='PER_SECOND',
+                        help="Enforce a per-subscription read quota refilled at this rate, as ARM does (ARM: 25).")
+    parser.add_argument('--reads-burst', type=int, default=250, help="Size of the per-subscription read quota (default: 250).")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    estate = RecordedEstate.from_file(args.fixture) if args.fixture else SyntheticEstate(args.resources, args.subscriptions, seed=args.seed)
+    server = FakeArmServer(estate, (args.host, args.port), page_size=args.page_size, latency=args.latency,
+                           throttle_rate=args.throttle_rate, unavailable_rate=args.unavailable_rate, retry_after=args.retry_after,
+                           reads_rate=args.reads_rate, reads_burst=args.reads_burst, seed=args.seed)
+    print(server.url, flush=True)
+    logger.info("Serving %s subscriptions at %s. Fetch them with:", len(estate.subscription_ids), server.url)
+    logger.info("asbuilt --arm-base-url %s %s", server.url, ' '.join(f"--subscription-id {sub_id}" for sub_id in estate.subscription_ids))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logger.info("Served: %s", ', '.join(f"{key} {value}" for key, value in sorted(server.stats.items())))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Offline Resource Graph client that answers the As-Built queries from a JSON fixture."""
+import re
+import json
+import threading
+from itertools import count
+from datetime import datetime
+# The Resource Graph SDK is imported by the first query
+
+# Only the filters used by the As-Built queries are understood
+TYPE_FILTER = re.compile(r"where\s+type\s*=~\s*'([^']+)'", re.IGNORECASE)
+ID_FILTER = re.compile(r"where\s+id\s+in~\s*\(([^)]*)\)", re.IGNORECASE)
+SINCE_FILTER = re.compile(r"changeTime\s*>\s*datetime\(([^)]+)\)", re.IGNORECASE)
+
+class FixtureResourceGraphClient:
+    """Offline stand-in for ResourceGraphClient that serves rows from a JSON fixture.
+
+    The fixture is either a list of Resource Graph rows or an object with a "rows" list
+    and an optional "changes" list of {"targetResourceId", "changeType", "changeTime"}
+    entries served to "resourcechanges" queries. Rows are filtered by subscription
+    (taken from the resource ID) and by the "where type =~", "where id in~" and
+    "changeTime > datetime()" clauses in the query, then returned in pages of
+    "$top" rows with a "$skipToken" for the next page, like the real service.
+    A query is filtered once, on its first page; its matches are kept under the
+    skip token until its last page is served.
+    """
+
+    def __init__(self, rows, page_size=1000, changes=None):
+        self.rows = rows
+        self.changes = changes or []
+        self.page_size = page_size
+        self.requests = []
+        self.results = {}  # Query number -> the matches of a query still being paged
+        self.queries = count()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path, page_size=1000):
+        with open(path) as f:
+            fixture = json.load(f)
+        if isinstance(fixture, dict):
+            return cls(fixture['rows'], page_size=page_size, changes=fixture.get('changes'))
+        return cls(fixture, page_size=page_size)
+
+    def _changes(self, query):
+        """Return the latest change per resource after the query's "datetime()" bound."""
+        since = SINCE_FILTER.search(query.query)
+        since = datetime.fromisoformat(since.group(1)) if since else None
+        latest = {}
+        for change in self.changes:
+            change_time = datetime.fromisoformat(change['changeTime'])
+            if since and change_time <= since:
+                continue
+            key = change['targetResourceId'].lower()
+            if key not in latest or change_time >= latest[key][0]:
+                latest[key] = (change_time, change)
+        return [
+            {"targetResourceId": change['targetResourceId'], "changeType": change['changeType']}
+            for _, change in latest.values()
+        ]
+
+    def _matches(self, query):
+        """Return every row matching a query's subscriptions and filters."""
+        subscriptions = {sub_id.lower() for sub_id in query.subscriptions or []}
+        if query.query.lstrip().lower().startswith('resourcechanges'):
+            return [
+                row for row in self._changes(query)
+                if not subscriptions or row['targetResourceId'].split('/')[2].lower() in subscriptions
+            ]
+        type_filter = TYPE_FILTER.search(query.query)
+        id_filter = ID_FILTER.search(query.query)
+        ids = {resource_id.strip().strip("'").lower() for resource_id in id_filter.group(1).split(',')} if id_filter else None
+        return [
+            row for row in self.rows
+            if (not subscriptions or row['id'].split('/')[2].lower() in subscriptions)
+            and (not type_filter or row['type'].lower() == type_filter.group(1).lower())
+            and (ids is None or row['id'].lower() in ids)
+        ]
+
+    def resources(self, query):
+        """Answer a QueryRequest with one page of matching rows."""
+        from azure.mgmt.resourcegraph.models import QueryResponse
+        self.requests.append(query)
+        options = query.options
+        top = min(options.top or self.page_size, self.page_size) if options else self.page_size
+        # A skip token is "{query number}:{first row of the next page}"
+        number, _, start = options.skip_token.partition(':') if options and options.skip_token else ('', '', '0')
+        with self.lock:
+            matches = self.results.get(number)
+        if matches is None:
+            matches = self._matches(query)
+            number = str(next(self.queries))
+        start = int(start)
+        page = matches[start:start + top]
+        next_start = start + len(page)
+        with self.lock:
+            if next_start < len(matches):
+                self.results[number] = matches
+            else:
+                self.results.pop(number, None)
+        return QueryResponse(
+            total_records=len(matches),
+            count=len(page),
+            result_truncated='false',
+            skip_token=f"{number}:{next_start}" if next_start < len(matches) else None,
+            data=page,
+        )
@@ -0,0 +1,354 @@
+"""Azure Resource Graph backend, per-type property enrichment and incremental change feeds."""
+import re
+import time
+import logging
+from itertools import chain
+from operator import attrgetter, itemgetter
+from concurrent.futures import ThreadPoolExecutor
+from .records import ResourceRecord, _subscription_of
+from .services import RESOURCE_TYPE_DETAILS
+from .process import COUNTED_TYPES
+from .session import ARM_BASE_URL, ENRICH_MAX_WORKERS, RateLimiter, RequestMetricsPolicy, http_transport, local_endpoint, management_client_options
+from .metrics import fetch_metrics
+from .collect import vnet_details
+# The Resource Graph SDK is imported by the functions that use it
+
+logger = logging.getLogger(__name__)
+
+# Resource Graph returns at most 1000 rows per page and accepts at most 1000 subscriptions per query
+RESOURCE_GRAPH_PAGE_SIZE = 1000
+
+RESOURCE_GRAPH_MAX_SUBSCRIPTIONS = 1000
+
+# KQL projections matching the fields returned by resources.list() and virtual_networks.list_all()
+RESOURCE_GRAPH_RESOURCES_QUERY = (
+    "Resources "
+    "| project id, name, type, location, kind, sku, tags, managedBy, identity, plan, extendedLocation "
+    "| order by id asc"
+)
+
+RESOURCE_GRAPH_VNETS_QUERY = (
+    "Resources "
+    "| where type =~ 'microsoft.network/virtualnetworks' "
+    "| project id, name, type, location, tags, etag, subscriptionId, properties "
+    "| order by id asc"
+)
+
+# Latest change per resource since the previous inventory; Resource Graph keeps 14 days of changes
+RESOURCE_GRAPH_CHANGES_QUERY = (
+    "resourcechanges "
+    "| extend changeTime = todatetime(properties.changeAttributes.timestamp), "
+    "targetResourceId = tostring(properties.targetResourceId), changeType = tostring(properties.changeType) "
+    "| where changeTime > datetime({since}) "
+    "| summarize arg_max(changeTime, changeType) by targetResourceId "
+    "| project targetResourceId, changeType"
+)
+
+RESOURCE_CHANGES_RETENTION_DAYS = 14
+
+RESOURCE_GRAPH_IDS_PER_QUERY = 500
+
+def _resource_name(resource_id):
+    """Return the last segment of a resource ID, such as an App Service plan's name."""
+    return resource_id.rstrip('/').rsplit('/', 1)[-1] if resource_id else None
+
+# Resource type -> {table header: path into the Resource Graph row, or a function of the row}.
+# These fill the SERVICE_HEADERS columns that resources.list() does not return.
+ENRICHED_PROPERTIES = {
+    "Microsoft.Compute/virtualMachines": {
+        "Size": ('properties', 'hardwareProfile', 'vmSize'),
+        "OS Type": ('properties', 'storageProfile', 'osDisk', 'osType'),
+    },
+    "Microsoft.Storage/storageAccounts": {
+        "Access Tier": ('properties', 'accessTier'),
+    },
+    "Microsoft.Web/sites": {
+        "App Service Plan": lambda row: _resource_name(_row_property(row, ('properties', 'serverFarmId'))),
+        "State": ('properties', 'state'),
+    },
+    "Microsoft.Sql/servers": {
+        "Version": ('properties', 'version'),
+        "State": ('properties', 'state'),
+    },
+    "Microsoft.Sql/servers/databases": {
+        "Database Edition": ('sku', 'tier'),
+        "Service Objective": ('properties', 'currentServiceObjectiveName'),
+    },
+}
+
+RESOURCE_GRAPH_DETAILS_QUERY = (
+    "Resources "
+    "| where type =~ '{resource_type}' "
+    "| project id, sku, properties "
+    "| order by id asc"
+)
+
+# Resource Graph allows 15 queries per 5 seconds per user; every query to it shares one limiter
+RESOURCE_GRAPH_RATE = 3.0  # Requests per second
+
+RESOURCE_GRAPH_BURST = 15
+
+def load_resource_graph_data(subscription_ids, fixture=None, token_cache=None, base_url=ARM_BASE_URL):
+    """Load a Resource Graph client for the given subscription IDs, or a fixture-backed fake.
+
+    base_url points the client at another ARM endpoint, such as asbuilt.fake_arm.
+    Only queries to Resource Graph itself are paced by the quota's rate limiter.
+    """
+    limiter = None
+    if fixture:
+        from .fake_resource_graph import FixtureResourceGraphClient
+        logger.info("Loading Resource Graph fixture from %s.", fixture)
+        client = FixtureResourceGraphClient.from_file(fixture)
+    else:
+        from azure.mgmt.resourcegraph import ResourceGraphClient
+        logger.info("Loading Resource Graph client for subscription IDs.")
+        credential, endpoint = management_client_options(base_url, token_cache)
+        client = ResourceGraphClient(credential, transport=http_transport(),
+                                     per_retry_policies=[RequestMetricsPolicy('resource-graph')], **endpoint)
+        if not local_endpoint(base_url):
+            limiter = RateLimiter(RESOURCE_GRAPH_RATE, RESOURCE_GRAPH_BURST)
+    return {"client": client, "subscription_ids": subscription_ids, "limiter": limiter}
+
+def query_resource_graph(graph_info, query):
+    """Run a KQL query across all subscriptions, yielding rows and following $skipToken paging.
+
+    Pages, rows and the time spent waiting for them are counted in fetch_metrics()
+    under 'resource-graph'.
+    """
+    from azure.mgmt.resourcegraph.models import QueryRequest, QueryRequestOptions
+    client = graph_info["client"]
+    subscription_ids = graph_info["subscription_ids"]
+    metrics = fetch_metrics()
+    for start in range(0, len(subscription_ids), RESOURCE_GRAPH_MAX_SUBSCRIPTIONS):
+        batch = subscription_ids[start:start + RESOURCE_GRAPH_MAX_SUBSCRIPTIONS]
+        skip_token = None
+        while True:
+            options = QueryRequestOptions(top=RESOURCE_GRAPH_PAGE_SIZE, skip_token=skip_token, result_format='objectArray')
+            began = time.perf_counter()
+            wait = graph_info["limiter"].acquire() if graph_info.get("limiter") else 0
+            response = client.resources(QueryRequest(subscriptions=batch, query=query, options=options))
+            metrics.add('resource-graph', pages=1, items=len(response.data), seconds=time.perf_counter() - began,
+                        throttle_wait_seconds=wait)
+            logger.debug("Resource Graph page returned %s of %s rows.", response.count, response.total_records)
+            yield from response.data
+            skip_token = response.skip_token
+            if not skip_token:
+                break
+
+def _snake_case(key):
+    """Convert a camelCase REST key to the snake_case key used by the SDK's as_dict()."""
+    return re.sub(r'(?<=[a-z0-9])([A-Z])', r'_\1', key).lower()
+
+def _graph_row_to_dict(value):
+    """Convert a Resource Graph row to the shape produced by the SDK models' as_dict()."""
+    if isinstance(value, list):
+        return [_graph_row_to_dict(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    converted = {}
+    for key, item in value.items():
+        if item is None:
+            continue
+        if key == 'properties' and isinstance(item, dict):
+            # The SDK flattens 'properties' into the top level of the model
+            converted.update(_graph_row_to_dict(item))
+        elif key == 'tags':
+            converted[key] = item
+        else:
+            converted[_snake_case(key)] = _graph_row_to_dict(item)
+    return converted
+
+# Resource Graph lower-cases resource types, so map them back to the casing used by ARM for every type
+# the document describes, counts or enriches; register_enricher adds the types it registers
+_CANONICAL_RESOURCE_TYPES = {resource_type.lower(): resource_type
+                             for resource_type in chain(RESOURCE_TYPE_DETAILS, COUNTED_TYPES.values(), ENRICHED_PROPERTIES)}
+
+def canonical_resource_type(resource_type):
+    """Return the ARM casing of a resource type, or the type unchanged if it is not a known one."""
+    return _CANONICAL_RESOURCE_TYPES.get(resource_type.lower(), resource_type)
+
+def _graph_row_to_record(row):
+    """Convert a Resource Graph row to a ResourceRecord with the ARM casing of its type."""
+    record = ResourceRecord.from_dict(_graph_row_to_dict(row))
+    record.type = canonical_resource_type(record.type)
+    return record
+
+def fetch_resources_graph(graph_info, spooler=None):
+    """Fetch all resources with batched Resource Graph queries and organize them by type.
+
+    With a spooler, each type's records go to a spool instead of a list. A failed
+    query is logged and raised, as the rows fetched so far are no inventory to keep.
+    """
+    all_resources = {}
+    new_list = spooler or (lambda resource_type: [])
+    try:
+        logger.info("Fetching resources from Resource Graph for %s subscriptions.", len(graph_info['subscription_ids']))
+        for row in query_resource_graph(graph_info, RESOURCE_GRAPH_RESOURCES_QUERY):
+            resource = _graph_row_to_record(row)
+            resource_type = resource.type
+            if resource_type not in all_resources:
+                all_resources[resource_type] = new_list(resource_type)
+            all_resources[resource_type].append(resource)
+    except Exception as e:
+        fetched = sum(len(resource_list) for resource_list in all_resources.values())
+        logger.error("Error fetching data from Resource Graph; the inventory is incomplete after %s resources: %s", fetched, e)
+        raise
+    return all_resources
+
+def fetch_network_details_graph(graph_info):
+    """Fetch details for VNets with a single Resource Graph query, keyed by subscription; a failed query is raised."""
+    virtual_networks = {sub_id: [] for sub_id in graph_info["subscription_ids"]}
+    network_details = {'virtualNetworks': virtual_networks}
+    try:
+        logger.info("Fetching network details from Resource Graph.")
+        for row in query_resource_graph(graph_info, RESOURCE_GRAPH_VNETS_QUERY):
+            vnet = vnet_details(_graph_row_to_dict(row))
+            virtual_networks.setdefault(row.get('subscriptionId') or _subscription_of(vnet['id']), []).append(vnet)
+    except Exception as e:
+        logger.error("Error fetching network details from Resource Graph: %s", e)
+        raise
+    return network_details
+
+def query_resource_graph_by_ids(graph_info, query, resource_ids):
+    """Run a Resource Graph query restricted to the given resource IDs, in batches."""
+    for start in range(0, len(resource_ids), RESOURCE_GRAPH_IDS_PER_QUERY):
+        batch = resource_ids[start:start + RESOURCE_GRAPH_IDS_PER_QUERY]
+        id_list = ', '.join("'" + resource_id.replace("'", "\\'") + "'" for resource_id in batch)
+        yield from query_resource_graph(graph_info, f"{query} | where id in~ ({id_list})")
+
+def _row_property(row, path):
+    """Follow a path of keys into a Resource Graph row, returning None where it stops."""
+    value = row
+    for key in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+def enrich_properties(graph_info, resource_type, resource_ids=None):
+    """Return {lower-case resource ID: {header: value}} for a type's ENRICHED_PROPERTIES.
+
+    One type-scoped Resource Graph query returns the properties of every resource
+    of the type, instead of one GET per resource.
+    """
+    query = RESOURCE_GRAPH_DETAILS_QUERY.format(resource_type=resource_type)
+    rows = query_resource_graph_by_ids(graph_info, query, resource_ids) if resource_ids else query_resource_graph(graph_info, query)
+    properties = ENRICHED_PROPERTIES[resource_type]
+    details = {}
+    for row in rows:
+        values = {}
+        for header, path in properties.items():
+            value = path(row) if callable(path) else _row_property(row, path)
+            if value is not None:
+                values[header] = str(value)
+        if values:
+            details[row['id'].lower()] = values
+    return details
+
+# Resource type -> enricher(graph_info, resource_type, resource_ids=None) returning
+# {lower-case resource ID: {header: value}}; register others with register_enricher
+ENRICHERS = {resource_type: enrich_properties for resource_type in ENRICHED_PROPERTIES}
+
+def register_enricher(resource_type):
+    """Decorator registering a function as the enricher for a resource type."""
+    def register(enricher):
+        ENRICHERS[resource_type] = enricher
+        _CANONICAL_RESOURCE_TYPES[resource_type.lower()] = resource_type
+        return enricher
+    return register
+
+def _run_enricher(graph_info, resource_type, resource_ids):
+    """Run one enricher, logging and returning no details if it fails."""
+    try:
+        return ENRICHERS[resource_type](graph_info, resource_type, resource_ids)
+    except Exception as e:
+        logger.error("Error fetching details for %s: %s", resource_type, e)
+        return {}
+
+def enrich_resources(graph_info, resources, by_id=False, max_workers=ENRICH_MAX_WORKERS):
+    """Fill the per-type detail columns of the resources with the registered enrichers.
+
+    Enrichers for different types run concurrently and share the Resource Graph
+    rate limiter. With by_id, only the given resources are queried, which suits
+    the handful of changed resources of an incremental run.
+    """
+    resource_types = [resource_type for resource_type in resources if resource_type in ENRICHERS and resources[resource_type]]
+    if not resource_types:
+        return resources
+    workers = max(1, min(max_workers, len(resource_types)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='enrich') as executor:
+        futures = [
+            executor.submit(_run_enricher, graph_info, resource_type,
+                            sorted(resource.id for resource in resources[resource_type]) if by_id else None)
+            for resource_type in resource_types
+        ]
+        for resource_type, future in zip(resource_types, futures):
+            details = future.result()
+            for resource in resources[resource_type]:
+                for header, value in details.get(resource.id.lower(), {}).items():
+                    resource.set_extra(header, value)
+            logger.info("Enriched %s of %s %s resources.", len(details), len(resources[resource_type]), resource_type)
+    return resources
+
+def fetch_resource_changes(graph_info, since):
+    """Return ({changed resource ID}, {deleted resource ID}) for changes after the given time."""
+    changed, deleted = set(), set()
+    query = RESOURCE_GRAPH_CHANGES_QUERY.format(since=since)
+    for row in query_resource_graph(graph_info, query):
+        if row['changeType'] == 'Delete':
+            deleted.add(row['targetResourceId'].lower())
+        else:
+            changed.add(row['targetResourceId'].lower())
+    logger.info("Resource Graph reported %s changed and %s deleted resources since %s.", len(changed), len(deleted), since)
+    return changed, deleted
+
+def _merge_changed(resource_list, changed_rows, removed_ids, key=itemgetter('id')):
+    """Replace or drop entries of a resource list in place, returning the rows not already present."""
+    positions = {key(resource).lower(): idx for idx, resource in enumerate(resource_list)}
+    new_rows = []
+    for resource in changed_rows:
+        idx = positions.get(key(resource).lower())
+        if idx is None:
+            new_rows.append(resource)
+        else:
+            resource_list[idx] = resource
+    if removed_ids:
+        resource_list[:] = [resource for resource in resource_list if key(resource).lower() not in removed_ids]
+    return new_rows
+
+def fetch_incremental_inventory(graph_info, resources, network_details, since, enrich=True):
+    """Apply the resource changes since the previous inventory to its resources and network details."""
+    changed, deleted = fetch_resource_changes(graph_info, since)
+
+    # Changed rows take the type casing of the inventory they merge into, which may come from the ARM backend
+    inventory_types = {resource_type.lower(): resource_type for resource_type in resources}
+    changed_resources = {}
+    for row in query_resource_graph_by_ids(graph_info, RESOURCE_GRAPH_RESOURCES_QUERY, sorted(changed)):
+        resource = _graph_row_to_record(row)
+        resource.type = inventory_types.get(resource.type.lower(), resource.type)
+        changed_resources.setdefault(resource.type, []).append(resource)
+    # A changed ID that no longer resolves in Resources has been deleted since the change was recorded
+    found = {resource.id.lower() for rows in changed_resources.values() for resource in rows}
+    deleted |= changed - found
+    if enrich:
+        enrich_resources(graph_info, changed_resources, by_id=True)
+
+    for resource_type in list(resources):
+        new_rows = _merge_changed(resources[resource_type], changed_resources.pop(resource_type, []), deleted, key=attrgetter('id'))
+        resources[resource_type].extend(new_rows)
+        if not resources[resource_type]:
+            del resources[resource_type]
+    for resource_type, rows in changed_resources.items():
+        resources[resource_type] = rows
+
+    vnet_ids = sorted(resource_id for resource_id in changed if '/providers/microsoft.network/virtualnetworks/' in resource_id)
+    changed_vnets = {}
+    for row in query_resource_graph_by_ids(graph_info, RESOURCE_GRAPH_VNETS_QUERY, vnet_ids):
+        vnet = vnet_details(_graph_row_to_dict(row))
+        changed_vnets.setdefault(_subscription_of(vnet['id']), []).append(vnet)
+    virtual_networks = network_details.setdefault('virtualNetworks', {})
+    for sub_id, vnets in virtual_networks.items():
+        vnets.extend(_merge_changed(vnets, changed_vnets.pop(sub_id, []), deleted))
+    for sub_id, vnets in changed_vnets.items():
+        virtual_networks[sub_id] = vnets
+    return resources, network_details
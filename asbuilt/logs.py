@@ -0,0 +1,94 @@
+"""Logging configuration: per-logger levels, JSON lines, and log I/O on a background thread."""
+import os
+import json
+import queue
+import atexit
+import logging
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_FILE = os.getenv('ASBUILT_LOG_FILE', 'asbuiltlogs.txt')
+
+LOG_LEVEL = os.getenv('ASBUILT_LOG_LEVEL', 'INFO')
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Libraries that log every HTTP request or token at INFO; raise them with --log-level NAME=LEVEL
+DEFAULT_LOGGER_LEVELS = {
+    'azure': 'WARNING',
+    'urllib3': 'WARNING',
+    'msal': 'WARNING',
+}
+
+class JsonLinesFormatter(logging.Formatter):
+    """Format each record as a JSON object on one line."""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class DeferredQueueHandler(QueueHandler):
+    """Queue records unformatted, so %-formatting also happens on the listener thread.
+
+    QueueHandler formats each record before queueing it, in case it is pickled to
+    another process. The listener here runs in the same process, so the record is
+    queued as it is. Arguments are formatted when the record is written, which is
+    fine for the immutable values logged here.
+    """
+
+    def prepare(self, record):
+        return record
+
+_listener = None
+
+def configure_logging(level=LOG_LEVEL, log_file=LOG_FILE, json_lines=False, logger_levels=None):
+    """Route every log record through a queue to the console and the log file.
+
+    The calling thread only queues records; a QueueListener thread formats and
+    writes them. logger_levels maps logger names to levels, on top of
+    DEFAULT_LOGGER_LEVELS. With json_lines, the log file (or the console, without a
+    log file) gets one JSON object per record.
+    """
+    global _listener
+    stop_logging()
+    text = logging.Formatter(LOG_FORMAT)
+    console = logging.StreamHandler()
+    handlers = [console]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file, mode='w'))  # Write mode to overwrite each run
+    for handler in handlers:
+        handler.setFormatter(text)
+    if json_lines:
+        handlers[-1].setFormatter(JsonLinesFormatter())
+
+    records = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(DeferredQueueHandler(records))
+    root.setLevel(level)
+    for name, logger_level in {**DEFAULT_LOGGER_LEVELS, **(logger_levels or {})}.items():
+        logging.getLogger(name).setLevel(logger_level)
+
+    _listener = QueueListener(records, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+def stop_logging():
+    """Write out the queued records and stop the listener thread."""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+
+atexit.register(stop_logging)
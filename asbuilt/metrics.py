@@ -0,0 +1,226 @@
+"""Measurements of a run: time and peak memory per stage, and what each subscription's fetch cost."""
+import os
+import re
+import sys
+import json
+import time
+import logging
+import tempfile
+import threading
+from datetime import datetime
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+_PROC_STATUS = '/proc/self/status'
+_PROC_CLEAR_REFS = '/proc/self/clear_refs'
+_VM_HWM = re.compile(r'^VmHWM:\s+(\d+) kB', re.MULTILINE)
+
+RUN_REPORT_VERSION = 1
+
+def peak_rss():
+    """Return the peak resident set size of the process in bytes, or None where it is unknown.
+
+    On Linux this is the high-water mark since the last reset_peak_rss(); elsewhere
+    it is the peak since the process started.
+    """
+    try:
+        with open(_PROC_STATUS) as f:
+            match = _VM_HWM.search(f.read())
+        if match:
+            return int(match.group(1)) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # Bytes on macOS, kilobytes elsewhere
+
+def reset_peak_rss():
+    """Reset the peak RSS to the current RSS where the kernel allows it; return whether it did."""
+    try:
+        with open(_PROC_CLEAR_REFS, 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def cpu_time():
+    """Return the CPU seconds used by every thread of the process and its finished child processes."""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+def _mib(value):
+    return 'n/a' if value is None else f"{value / 2 ** 20:.1f} MiB"
+
+class StageMetrics:
+    """The wall time, CPU time and peak memory of each stage of a run, in the order the stages ran.
+
+    Steps are timed parts of a stage, such as acquiring the credential while
+    collecting; they do not reset the peak memory of the stage they belong to.
+    """
+
+    def __init__(self):
+        self.stages = []  # Dicts with the name, wall_seconds, cpu_seconds, peak_rss_bytes and peak_reset of each stage
+        self.steps = []  # Dicts with the stage, name, wall_seconds and cpu_seconds of each step
+        self.current = None
+
+    @contextmanager
+    def stage(self, name):
+        """Measure the time and the peak RSS while the body of the with statement runs."""
+        reset = reset_peak_rss()
+        self.current = name
+        wall, cpu = time.perf_counter(), cpu_time()
+        try:
+            yield
+        finally:
+            self.stages.append({
+                "name": name,
+                "wall_seconds": time.perf_counter() - wall,
+                "cpu_seconds": cpu_time() - cpu,
+                "peak_rss_bytes": peak_rss(),
+                "peak_reset": reset,
+            })
+            self.current = None
+
+    @contextmanager
+    def step(self, name):
+        """Measure the time of part of the current stage."""
+        wall, cpu = time.perf_counter(), cpu_time()
+        try:
+            yield
+        finally:
+            self.steps.append({"stage": self.current, "name": name,
+                               "wall_seconds": time.perf_counter() - wall, "cpu_seconds": cpu_time() - cpu})
+
+    def peak(self, name):
+        """Return the peak RSS of a stage in bytes, or None if it has not run."""
+        return next((stage["peak_rss_bytes"] for stage in self.stages if stage["name"] == name), None)
+
+    def wall_seconds(self, name):
+        """Return the wall time of a stage in seconds, or None if it has not run."""
+        return next((stage["wall_seconds"] for stage in self.stages if stage["name"] == name), None)
+
+    def log_summary(self):
+        if not self.stages:
+            return
+        logger.info("Peak memory by stage: %s", ', '.join(f"{stage['name']} {_mib(stage['peak_rss_bytes'])}" for stage in self.stages))
+        if not all(stage["peak_reset"] for stage in self.stages):
+            logger.info("The peak could not be reset between stages, so each figure includes the stages before it.")
+
+# Counted per scope by FetchMetrics; seconds is the time spent listing a subscription's resources
+FETCH_COUNTERS = ('pages', 'items', 'seconds', 'requests', 'bytes_received', 'retries', 'throttled', 'throttle_wait_seconds')
+
+class FetchMetrics:
+    """What the requests of a run fetched and cost, per scope, added to by every fetch thread.
+
+    A scope is a subscription ID, lower-cased as in request URLs, 'tenant' for ARM
+    requests outside a subscription, or 'resource-graph' for Resource Graph queries.
+    """
+
+    def __init__(self):
+        self.scopes = {}
+        self.lock = threading.Lock()
+
+    def add(self, scope, **counts):
+        """Add to the FETCH_COUNTERS of a scope."""
+        with self.lock:
+            entry = self.scopes.get(scope)
+            if entry is None:
+                entry = self.scopes[scope] = dict.fromkeys(FETCH_COUNTERS, 0)
+            for key, value in counts.items():
+                entry[key] += value
+
+    def clear(self):
+        with self.lock:
+            self.scopes = {}
+
+    def report(self):
+        """Return the counters of every scope and their totals, each with the items fetched per second."""
+        with self.lock:
+            scopes = {scope: dict(entry) for scope, entry in sorted(self.scopes.items())}
+        totals = {key: sum(entry[key] for entry in scopes.values()) for key in FETCH_COUNTERS}
+        for entry in (*scopes.values(), totals):
+            entry["items_per_second"] = entry["items"] / entry["seconds"] if entry["seconds"] else None
+        return {"scopes": scopes, "totals": totals}
+
+_fetch_metrics = FetchMetrics()
+
+def fetch_metrics():
+    """Return the fetch counters of the process, shared by every client and thread."""
+    return _fetch_metrics
+
+def _write_atomically(path, text):
+    """Write a file through a temporary file in the same directory, so readers never see half of it."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.asbuilt-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+def write_run_report(path, report):
+    """Write the run report as JSON."""
+    _write_atomically(path, json.dumps(report, indent=2, default=str) + '\n')
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _sample(name, labels, value):
+    label_text = ','.join(f'{key}="{_label(label)}"' for key, label in labels.items())
+    return f"{name}{{{label_text}}} {value!r}" if label_text else f"{name} {value!r}"
+
+def prometheus_text(report):
+    """Return the run report in the Prometheus text exposition format, for node_exporter's textfile collector."""
+    metrics = [
+        ("asbuilt_last_run_timestamp_seconds", "Time the run finished.", [({}, datetime.fromisoformat(report["finished"]).timestamp())]),
+        ("asbuilt_resources", "Resources in the report.", [({}, report["resources"])]),
+    ]
+    for key, help_text in (("wall_seconds", "Wall time of a stage."), ("cpu_seconds", "CPU time of a stage."),
+                           ("peak_rss_bytes", "Peak resident set size during a stage.")):
+        samples = [({"stage": stage["name"]}, stage[key]) for stage in report["stages"] if stage[key] is not None]
+        metrics.append((f"asbuilt_stage_{key}", help_text, samples))
+    metrics.append(("asbuilt_step_wall_seconds", "Wall time of a step of a stage.",
+                    [({"stage": step["stage"], "step": step["name"]}, step["wall_seconds"]) for step in report["steps"]]))
+    for key in FETCH_COUNTERS:
+        samples = [({"scope": scope}, entry[key]) for scope, entry in report["fetch"]["scopes"].items()]
+        metrics.append((f"asbuilt_fetch_{key}", f"Fetch {key.replace('_', ' ')} per subscription or service.", samples))
+    for key, value in report["http"].items():
+        metrics.append((f"asbuilt_http_{key}", f"HTTP {key.replace('_', ' ')} of the shared transport.", [({}, value)]))
+
+    lines = []
+    for name, help_text, samples in metrics:
+        if samples:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+            lines += [_sample(name, labels, value) for labels, value in samples]
+    return '\n'.join(lines) + '\n'
+
+def write_prometheus_textfile(path, report):
+    """Write the run report as a Prometheus textfile, replacing the previous one atomically."""
+    _write_atomically(path, prometheus_text(report))
+
+def format_timings(report):
+    """Return a plain-text summary of the stage timings and the fetch counters of a run report."""
+    lines = [f"{'Stage':<24} {'Wall s':>8} {'CPU s':>8} {'Peak MiB':>9}"]
+    for stage in report["stages"]:
+        peak = stage["peak_rss_bytes"]
+        lines.append(f"{stage['name']:<24} {stage['wall_seconds']:8.2f} {stage['cpu_seconds']:8.2f} "
+                     f"{'n/a' if peak is None else format(peak / 2 ** 20, '.1f'):>9}")
+        for step in report["steps"]:
+            if step["stage"] == stage["name"]:
+                lines.append(f"  {step['name']:<22} {step['wall_seconds']:8.2f} {step['cpu_seconds']:8.2f}")
+    scopes = report["fetch"]["scopes"]
+    if scopes:
+        lines += ["", f"{'Scope':<38} {'Pages':>6} {'Items':>8} {'Items/s':>8} {'Requests':>8} {'KiB':>9} "
+                      f"{'Retries':>7} {'Throttled':>9} {'Wait s':>7}"]
+        for scope, entry in (*scopes.items(), ("total", report["fetch"]["totals"])):
+            rate = entry["items_per_second"]
+            lines.append(f"{scope:<38} {entry['pages']:6} {entry['items']:8} {'' if rate is None else format(rate, '.0f'):>8} "
+                         f"{entry['requests']:8} {entry['bytes_received'] / 1024:9.0f} {entry['retries']:7} "
+                         f"{entry['throttled']:9} {entry['throttle_wait_seconds']:7.2f}")
+    return '\n'.join(lines)
@@ -0,0 +1,233 @@
+"""Group resources into document sections and count them for the summary."""
+import logging
+from operator import attrgetter, itemgetter
+from collections import Counter
+from .services import RESOURCE_TYPE_DETAILS, SERVICE_HEADERS
+from .records import ResourceRecord
+from .spool import record_batches
+
+logger = logging.getLogger(__name__)
+
+# Summary paragraph and labelled totals shared by every output format
+SUMMARY_TEXT = (
+    "This As-Built Document provides a comprehensive overview of the current state of Azure resources "
+    "within the specified subscription IDs. It includes detailed information about various services, "
+    "such as Virtual Machines, Storage Accounts, Virtual Networks, and more. Each section contains "
+    "a description of the service, a table of key resource attributes, and unique resource IDs."
+)
+
+COUNT_LABELS = [
+    ("Subscriptions", "subscriptions"),
+    ("Resource Groups", "resource_groups"),
+    ("Virtual Machines", "virtual_machines"),
+    ("Disks", "disks"),
+    ("Storage Accounts", "storage_accounts"),
+    ("Virtual Networks", "vnets"),
+]
+
+# Headline totals: counts key -> resource type counted
+COUNTED_TYPES = {
+    "virtual_machines": "Microsoft.Compute/virtualMachines",
+    "disks": "Microsoft.Compute/disks",
+    "storage_accounts": "Microsoft.Storage/storageAccounts",
+    "vnets": "Microsoft.Network/virtualNetworks",
+}
+
+# Summary dimensions: (key, section title, value column header, ResourceRecord field)
+# Every dimension is counted in the same pass; the "tags" field counts tag keys.
+COUNT_DIMENSIONS = [
+    ("type", "Resources by Type", "Type", 'type'),
+    ("location", "Resources by Location", "Location", 'location'),
+    ("sku", "Resources by SKU", "SKU", 'sku'),
+    ("tag", "Resources by Tag Key", "Tag Key", 'tags'),
+    ("resource_group", "Resources by Resource Group", "Resource Group", 'resource_group'),
+    ("subscription", "Resources by Subscription", "Subscription", 'subscription_id'),
+]
+
+COUNT_CHUNK = 4096  # Records aggregate_counts passes over together, so each pass after the first finds them in the CPU cache
+
+SUMMARY_TOP_N = 20  # Values listed per dimension before the rest are folded into "Other"
+
+def vnet_address_prefixes(network_details):
+    """Map lower-cased VNet IDs to their address prefixes, for VNets listed without their properties."""
+    return {
+        vnet['id'].lower(): vnet['address_prefixes']
+        for vnets in network_details.get('virtualNetworks', {}).values()
+        for vnet in vnets
+    }
+
+def aggregate_counts(resources, columns=None):
+    """Count resources along every COUNT_DIMENSIONS dimension.
+
+    With a columns dict, the column occupancy bitmap of each type's section is
+    found in the same pass over the records and stored in it by type, so spilled
+    records are read back once.
+
+    Each resource list, or each batch of a spool, is counted in passes that run in
+    C over tuples the records already hold: the count_key of their fields with few
+    distinct values, and the names of their TagSet. Far fewer distinct tuples than
+    resources come out, and only those are spread over the per-dimension counters.
+    Other fields, such as the resource group, are counted on their own. The passes
+    run over COUNT_CHUNK records at a time.
+    """
+    dimensions = {key: Counter() for key, _, _, _ in COUNT_DIMENSIONS}
+    type_keys = [key for key, _, _, field in COUNT_DIMENSIONS if field == 'type']
+    tag_keys = [key for key, _, _, field in COUNT_DIMENSIONS if field == 'tags']
+    keyed = [(key, ResourceRecord.COUNT_FIELDS.index(field))
+             for key, _, _, field in COUNT_DIMENSIONS if field in ResourceRecord.COUNT_FIELDS]
+    direct = [(key, attrgetter(field)) for key, _, _, field in COUNT_DIMENSIONS
+              if field not in ('type', 'tags') + ResourceRecord.COUNT_FIELDS]
+    count_keys, tag_sets = Counter(), Counter()
+    for resource_type, resource_list in resources.items():
+        headers = type_headers(resource_type) if columns is not None else None
+        occupied = 0
+        for batch in record_batches(resource_list):
+            for key in type_keys:
+                dimensions[key][resource_type] += len(batch)
+            if headers:
+                occupied = column_occupancy(headers, batch, occupied)
+            for start in range(0, len(batch), COUNT_CHUNK):
+                chunk = batch[start:start + COUNT_CHUNK]
+                if keyed:
+                    count_keys.update(map(attrgetter('count_key'), chunk))
+                for key, value in direct:
+                    dimensions[key].update(map(value, chunk))
+                if tag_keys:
+                    tags = list(filter(None, map(attrgetter('tags'), chunk)))
+                    try:
+                        names = Counter(map(attrgetter('names'), tags))
+                    except AttributeError:  # Plain dicts, such as the tags of records built from table columns
+                        names = Counter(map(tuple, tags))
+                    tag_sets.update(names)
+        if headers:
+            columns[resource_type] = occupied
+    totals = list(count_keys.values())
+    for key, index in keyed:
+        counter = dimensions[key]
+        get = counter.get
+        for value, n in zip(map(itemgetter(index), count_keys), totals):
+            counter[value] = get(value, 0) + n
+    for names, n in tag_sets.items():
+        for key in tag_keys:
+            for name in names:
+                dimensions[key][name] += n
+    return headline_counts(dimensions)
+
+def headline_counts(dimensions):
+    """Build the counts dict, with the headline totals, from the per-dimension counters."""
+    counts = {
+        "subscriptions": len(dimensions["subscription"]),
+        "resource_groups": len(dimensions["resource_group"]),
+    }
+    for key, resource_type in COUNTED_TYPES.items():
+        counts[key] = dimensions["type"][resource_type]
+    counts["dimensions"] = dimensions
+    return counts
+
+def summary_tables(counts, top=SUMMARY_TOP_N):
+    """Yield (title, value header, [(value, count)]) for each non-empty count dimension, largest first."""
+    dimensions = counts.get("dimensions", {})
+    for key, title, header, _ in COUNT_DIMENSIONS:
+        counter = dimensions.get(key)
+        if not counter:
+            continue
+        ranked = sorted(((str(value) if value is not None else 'N/A', n) for value, n in counter.items()),
+                        key=lambda pair: (-pair[1], pair[0]))
+        rows = ranked[:top]
+        if len(ranked) > top:
+            rows.append((f"Other ({len(ranked) - top} values)", sum(n for _, n in ranked[top:])))
+        yield title, header, rows
+
+def section_headers(service_name):
+    """Return the table headers for a service, before empty columns are removed."""
+    # Add address space for VNets
+    if service_name == "Azure Virtual Networks":
+        return ["Name", "Resource Group", "Location", "Address Space", "Tags"]
+    return SERVICE_HEADERS.get(service_name, ["Name", "Resource Group", "Location", "Kind", "SKU", "Tags"])
+
+def column_occupancy(headers, content, occupied=0):
+    """Return a bitmap with bit i set when any row has a value for headers[i].
+
+    Rows are scanned once, only testing the columns not yet seen, and the scan
+    stops as soon as every column is occupied. Passing the bitmap of earlier
+    batches continues it.
+    """
+    full = (1 << len(headers)) - 1
+    if occupied == full:
+        return occupied
+    for item in content:
+        for bit, header in enumerate(headers):
+            if not occupied >> bit & 1 and item.get(header, 'N/A') != 'N/A':
+                occupied |= 1 << bit
+        if occupied == full:
+            break
+    return occupied
+
+def occupied_headers(headers, occupied):
+    """Return the headers whose bit is set in an occupancy bitmap."""
+    return [header for bit, header in enumerate(headers) if occupied >> bit & 1]
+
+def type_headers(resource_type):
+    """Return the table headers of a resource type's section, before empty columns are removed."""
+    return section_headers(RESOURCE_TYPE_DETAILS.get(resource_type, (resource_type,))[0])
+
+def service_section(resource_type, content, columns=None):
+    """Build a section for a resource type, with its headers and column occupancy bitmap.
+
+    The bitmap is found by scanning content unless aggregate_counts already did.
+    """
+    service_name, service_description = RESOURCE_TYPE_DETAILS.get(resource_type, (resource_type, "Description not available."))
+    headers = section_headers(service_name)
+    return {
+        "title": f"Service: {service_name}",
+        "description": service_description,
+        "content": content,
+        "headers": headers,
+        "columns": column_occupancy(headers, content) if columns is None else columns,
+    }
+
+def set_address_spaces(records, vnet_prefixes):
+    """Set the "Address Space" column of VNet records from their network details."""
+    for resource in records:
+        address_prefixes = vnet_prefixes.get(resource.id.lower(), [])
+        resource.set_extra("Address Space", ', '.join(address_prefixes) or None)
+
+def process_resource_data(resources, network_details):
+    """Process resource data to extract relevant information."""
+    sections = []
+    # Add address space for VNets before they are scanned; spooled records have it set before they are spilled
+    vnets = resources.get("Microsoft.Network/virtualNetworks")
+    if isinstance(vnets, list):
+        set_address_spaces(vnets, vnet_address_prefixes(network_details))
+    columns = {}
+    counts = aggregate_counts(resources, columns)
+
+    for resource_type, resource_list in resources.items():
+        logger.debug("Processing resource type: %s", resource_type)
+        # Records are read by header, so no per-resource copy is made
+        section = service_section(resource_type, resource_list, columns[resource_type])
+        logger.debug("%s: columns %s", section['title'], ', '.join(occupied_headers(section['headers'], section['columns'])))
+        sections.append(section)
+
+    logger.info("Processed resource data: %s", ', '.join(f'{key}: {counts[key]}' for _, key in COUNT_LABELS))
+    return sections, counts
+
+def remove_empty_columns(headers, content):
+    """Remove columns that are entirely empty from headers.
+
+    Rows are read by header, so they are returned as they are rather than rebuilt
+    without the empty columns.
+    """
+    return occupied_headers(headers, column_occupancy(headers, content)), content
+
+def cell_text(value):
+    """Return the display text of a table cell value, the same in every output format."""
+    if isinstance(value, dict):
+        return ', '.join(f"{k}: {v}" for k, v in value.items()) or 'N/A'
+    return str(value)
+
+def section_table(section):
+    """Return the table headers and row content for a section, without empty columns."""
+    if 'columns' in section:
+        return occupied_headers(section['headers'], section['columns']), section['content']
+    return remove_empty_columns(section_headers(section['title'].replace("Service: ", "")), section['content'])
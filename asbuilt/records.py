@@ -0,0 +1,198 @@
+"""Compact resource records shared by every stage of the pipeline."""
+import sys
+import re
+
+_RESOURCE_GROUP_IN_ID = re.compile(r'/resourceGroups/([^/]+)', re.IGNORECASE)
+
+# Most resource IDs have this form, so a record keeps its ID only when it cannot be rebuilt from its other fields
+_ID_FORM = '/subscriptions/{}/resourceGroups/{}/providers/{}/{}'
+
+# Distinct tag sets kept for sharing, per set of tag names, and distinct sets of tag names; past this, new ones are
+# kept per record
+TAG_SETS_MAX = 65536
+
+# Distinct combinations of the COUNT_FIELDS values kept for sharing; past this, new ones are kept per record
+COUNT_KEYS_MAX = 65536
+
+_tag_sets = {}  # Tag names -> (the shared tuple of those names, {tuple of tag values: TagSet})
+_count_keys = {}
+
+class TagSet(dict):
+    """A tag dict that also holds the tuple of its tag names, shared by every tag set with the same names.
+
+    aggregate_counts counts the names of each record's tags by that tuple
+    instead of building one per record.
+    """
+    __slots__ = ('names',)
+
+def _intern(value):
+    """Intern a repeated string value such as a location or SKU name."""
+    return sys.intern(value) if isinstance(value, str) else value
+
+def _count_key(values):
+    """Return one shared tuple for each distinct combination of COUNT_FIELDS values."""
+    key = _count_keys.get(values)
+    if key is None:
+        key = values
+        if len(_count_keys) < COUNT_KEYS_MAX:
+            _count_keys[key] = key
+    return key
+
+def _shared_tags(tags):
+    """Return one shared TagSet, with interned keys and values, for each distinct tag set.
+
+    Most resources carry a few policy-applied tags, so records with the same tags
+    share one dict, and tag values repeated across records share one string. The
+    sets are found by their tag names and then by the tuple of their values, which
+    holds the same interned strings as the TagSet. Records never modify their tags.
+    """
+    if not tags:
+        return tags
+    names = tuple(tags)
+    entry = _tag_sets.get(names)
+    if entry is None:
+        entry = (tuple(map(_intern, names)), {})
+        if len(_tag_sets) < TAG_SETS_MAX:
+            _tag_sets[entry[0]] = entry
+    names, sets = entry
+    values = tuple(map(_intern, tags.values()))
+    try:
+        shared, hashable = sets.get(values), True
+    except TypeError:  # A tag value that cannot be hashed
+        shared, hashable = None, False
+    if shared is None:
+        shared = TagSet(zip(names, values))
+        shared.names = names
+        if hashable and len(sets) < TAG_SETS_MAX:
+            sets[values] = shared
+    return shared
+
+class ResourceRecord:
+    """The fields of a resource the report needs, captured once at fetch time.
+
+    Records replace both the SDK's as_dict() output and the per-resource dict that
+    process_resource_data used to build, and are read by table header with get().
+    Values that are missing are stored as None and reported as 'N/A'. The ID is
+    kept only when it cannot be rebuilt from the other fields.
+    """
+    FIELDS = ('id', 'name', 'type', 'resource_group', 'location', 'kind', 'sku', 'tags', 'extras', 'subscription_id')
+
+    # Fields with few distinct values, held by each record as one shared count_key tuple that aggregate_counts counts
+    COUNT_FIELDS = ('location', 'sku', 'subscription_id')
+
+    # _id is False when the ID is rebuilt from the other fields, see the id property; the COUNT_FIELDS values
+    # are read from count_key
+    __slots__ = ('_id', 'name', 'type', 'resource_group', 'kind', 'tags', 'extras', 'count_key')
+
+    # Table header -> attribute; anything else is looked up in extras
+    HEADER_FIELDS = {
+        "Name": 'name',
+        "Resource Group": 'resource_group',
+        "Location": 'location',
+        "Kind": 'kind',
+        "SKU": 'sku',
+        "Tags": 'tags',
+        "ID": 'id',
+    }
+
+    def __init__(self, id, name, type, resource_group=None, location=None, kind=None, sku=None, tags=None, extras=None,
+                 subscription_id=None):
+        self.name = name
+        self.type = _intern(type)
+        if resource_group is None and id:
+            match = _RESOURCE_GROUP_IN_ID.search(id)
+            resource_group = match.group(1) if match else None
+        self.resource_group = _intern(resource_group)
+        self.kind = _intern(kind)
+        self.tags = _shared_tags(tags)
+        self.extras = extras
+        if subscription_id is None and id:
+            subscription_id = _subscription_of(id).lower()
+        self.count_key = _count_key((_intern(location), _intern(sku), _intern(subscription_id)))
+        self.id = id
+
+    @property
+    def location(self):
+        return self.count_key[0]
+
+    @property
+    def sku(self):
+        return self.count_key[1]
+
+    @property
+    def subscription_id(self):
+        return self.count_key[2]
+
+    @property
+    def id(self):
+        """The resource ID, which is kept only when it differs from the one built from the other fields."""
+        if self._id is not False:
+            return self._id
+        return _ID_FORM.format(self.subscription_id, self.resource_group, self.type, self.name)
+
+    @id.setter
+    def id(self, value):
+        # Set after the subscription, resource group, type and name
+        if value and value == _ID_FORM.format(self.subscription_id, self.resource_group, self.type, self.name):
+            value = False
+        self._id = value
+
+    @classmethod
+    def from_model(cls, resource):
+        """Build a record from an SDK resource model without materialising as_dict()."""
+        return cls(resource.id, resource.name, resource.type, None, resource.location, resource.kind,
+                   resource.sku.name if resource.sku else None, resource.tags)
+
+    @classmethod
+    def from_dict(cls, resource):
+        """Build a record from an as_dict()-shaped resource or a record saved with to_dict()."""
+        sku = resource.get('sku')
+        return cls(resource.get('id'), resource.get('name'), resource.get('type'),
+                   resource.get('resource_group') or resource.get('resourceGroup'),
+                   resource.get('location'), resource.get('kind'),
+                   sku.get('name') if isinstance(sku, dict) else sku,
+                   resource.get('tags'), resource.get('extras'), resource.get('subscription_id'))
+
+    @classmethod
+    def from_columns(cls, ids, names, types, resource_groups, locations, kinds, skus, tags, extras, subscription_ids):
+        """Build records from parallel column lists whose values are already normalised."""
+        records = []
+        append = records.append
+        new = object.__new__
+        count_keys = map(_count_key, zip(locations, skus, subscription_ids))
+        for values in zip(names, types, resource_groups, kinds, tags, extras, count_keys, ids):
+            record = new(cls)
+            (record.name, record.type, record.resource_group, record.kind,
+             record.tags, record.extras, record.count_key, record.id) = values
+            append(record)
+        return records
+
+    def to_dict(self):
+        """Return the record as a dict of its non-empty fields, for snapshots."""
+        return {field: getattr(self, field) for field in self.FIELDS if getattr(self, field) is not None}
+
+    def get(self, header, default='N/A'):
+        """Return the value for a table header, or default when it is missing."""
+        field = self.HEADER_FIELDS.get(header)
+        if field is not None:
+            value = getattr(self, field)
+        else:
+            value = self.extras.get(header) if self.extras else None
+        return default if value is None else value
+
+    def set_extra(self, header, value):
+        """Set a per-type value such as a VNet's "Address Space"."""
+        if self.extras is None:
+            self.extras = {}
+        self.extras[header] = value
+
+    def items(self):
+        """Return (header, value) pairs for every available column."""
+        pairs = [(header, getattr(self, field)) for header, field in self.HEADER_FIELDS.items()]
+        if self.extras:
+            pairs.extend(self.extras.items())
+        return [(header, value) for header, value in pairs if value is not None]
+
+def _subscription_of(resource_id):
+    """Return the subscription ID segment of an ARM resource ID."""
+    return resource_id.split('/')[2]
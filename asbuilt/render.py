@@ -0,0 +1,212 @@
+"""Output renderers for docx, JSON lines, CSV, Markdown, HTML and Excel."""
+import os
+import csv
+import html
+import re
+import json
+import logging
+from contextlib import nullcontext
+from .process import COUNT_LABELS, SUMMARY_TEXT, cell_text, section_table, summary_tables
+from .word import generate_document, generate_document_streaming
+
+logger = logging.getLogger(__name__)
+
+def section_rows(section):
+    """Return the table headers and an iterator of row tuples of display text for a section.
+
+    Rows are produced as the renderer writes them, so a section's display text is
+    never held in memory all at once.
+    """
+    headers, content = section_table(section)
+    return headers, (tuple(cell_text(item.get(header, 'N/A')) for header in headers) for item in content)
+
+def render_docx(sections, counts, basename):
+    """Render the Word document in memory."""
+    filename = f"{basename}.docx"
+    generate_document(sections, counts, filename)
+    return filename
+
+def render_docx_streaming(sections, counts, basename, workers=0):
+    """Render the Word document, streaming its body into the package."""
+    filename = f"{basename}.docx"
+    generate_document_streaming(sections, counts, filename, workers)
+    return filename
+
+def render_jsonl(sections, counts, basename):
+    """Render the counts and one JSON object per resource, one per line."""
+    filename = f"{basename}.jsonl"
+    with open(filename, 'w', encoding='utf-8') as f:
+        f.write(json.dumps({"counts": counts}) + '\n')
+        for section in sections:
+            for item in section['content']:
+                f.write(json.dumps({"section": section['title'], **dict(item.items())}, default=str) + '\n')
+    return filename
+
+def _csv_filename(title):
+    """Return a file-system safe CSV file name for a section title."""
+    return re.sub(r'[^A-Za-z0-9._-]+', '_', title.replace("Service: ", "")).strip('_') + '.csv'
+
+def render_csv(sections, counts, basename):
+    """Render one CSV file per service, plus the counts, into a directory."""
+    directory = f"{basename}_csv"
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, 'counts.csv'), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["Count", "Value"])
+        writer.writerows((label, counts[key]) for label, key in COUNT_LABELS)
+    with open(os.path.join(directory, 'summary.csv'), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["Dimension", "Value", "Count"])
+        for title, _, rows in summary_tables(counts):
+            writer.writerows((title, value, n) for value, n in rows)
+    for section in sections:
+        headers, rows = section_rows(section)
+        with open(os.path.join(directory, _csv_filename(section['title'])), 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(headers + ["ID"])
+            writer.writerows(row + (item.get('ID', 'N/A'),) for row, item in zip(rows, section['content']))
+    return directory
+
+def _markdown_cell(text):
+    """Escape a value for a Markdown table cell."""
+    return text.replace('\\', '\\\\').replace('|', '\\|').replace('\n', '<br>')
+
+def render_markdown(sections, counts, basename):
+    """Render the document as Markdown."""
+    filename = f"{basename}.md"
+    with open(filename, 'w', encoding='utf-8') as f:
+        f.write("# As-Built Document\n\n## Summary\n\n" + SUMMARY_TEXT + "\n\n## Total Counts\n\n")
+        for label, key in COUNT_LABELS:
+            f.write(f"- {label}: {counts[key]}\n")
+        for title, header, rows in summary_tables(counts):
+            f.write(f"\n### {title}\n\n| {header} | Count |\n|---|---|\n")
+            for value, n in rows:
+                f.write(f"| {_markdown_cell(value)} | {n} |\n")
+        f.write("\n## Table of Contents\n\n")
+        for i, section in enumerate(sections):
+            f.write(f"{i + 1}. [{section['title']}](#section-{i + 1})\n")
+        for i, section in enumerate(sections):
+            headers, rows = section_rows(section)
+            f.write(f"\n<a id=\"section-{i + 1}\"></a>\n\n## {section['title']}\n\n{section['description']}\n\n")
+            f.write("| " + " | ".join(headers) + " |\n")
+            f.write("|" + "---|" * len(headers) + "\n")
+            for row in rows:
+                f.write("| " + " | ".join(_markdown_cell(value) for value in row) + " |\n")
+            f.write("\n")
+            for item in section['content']:
+                f.write(f"- **ID:** `{item.get('ID', 'N/A')}`\n")
+    return filename
+
+HTML_STYLE = (
+    "body{font-family:Aptos,Segoe UI,sans-serif;margin:2em;color:#000}"
+    "table{border-collapse:collapse;margin:1em 0}"
+    "th,td{border:1px solid #444;padding:4px 8px;text-align:left;vertical-align:top}"
+    "th{background:#87CEEB;color:#fff}"
+    "code{font-size:90%}"
+)
+
+def render_html(sections, counts, basename):
+    """Render the document as a self-contained HTML page."""
+    filename = f"{basename}.html"
+    esc = html.escape
+    with open(filename, 'w', encoding='utf-8') as f:
+        f.write(f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>As-Built Document</title>"
+                f"<style>{HTML_STYLE}</style></head><body>\n")
+        f.write(f"<h1>As-Built Document</h1>\n<h2>Summary</h2>\n<p>{esc(SUMMARY_TEXT)}</p>\n<h2>Total Counts</h2>\n<ul>\n")
+        for label, key in COUNT_LABELS:
+            f.write(f"<li>{esc(label)}: {counts[key]}</li>\n")
+        f.write("</ul>\n")
+        for title, header, rows in summary_tables(counts):
+            f.write(f"<h3>{esc(title)}</h3>\n<table>\n<tr><th>{esc(header)}</th><th>Count</th></tr>\n")
+            for value, n in rows:
+                f.write(f"<tr><td>{esc(value)}</td><td>{n}</td></tr>\n")
+            f.write("</table>\n")
+        f.write("<h2>Table of Contents</h2>\n<ol>\n")
+        for i, section in enumerate(sections):
+            f.write(f"<li><a href=\"#section-{i + 1}\">{esc(section['title'])}</a></li>\n")
+        f.write("</ol>\n")
+        for i, section in enumerate(sections):
+            headers, rows = section_rows(section)
+            f.write(f"<h2 id=\"section-{i + 1}\">{esc(section['title'])}</h2>\n<p>{esc(section['description'])}</p>\n<table>\n<tr>")
+            f.write("".join(f"<th>{esc(header)}</th>" for header in headers) + "</tr>\n")
+            for row in rows:
+                f.write("<tr>" + "".join(f"<td>{esc(value)}</td>" for value in row) + "</tr>\n")
+            f.write("</table>\n<ul>\n")
+            for item in section['content']:
+                f.write(f"<li><b>ID:</b> <code>{esc(str(item.get('ID', 'N/A')))}</code></li>\n")
+            f.write("</ul>\n")
+        f.write("</body></html>\n")
+    return filename
+
+def _sheet_title(title, used):
+    """Return a unique Excel sheet title (at most 31 characters, no []:*?/\\)."""
+    base = re.sub(r'[\[\]:*?/\\]', '', title.replace("Service: ", ""))[:31] or 'Sheet'
+    candidate, n = base, 2
+    while candidate.lower() in used:
+        suffix = f" ({n})"
+        candidate, n = base[:31 - len(suffix)] + suffix, n + 1
+    used.add(candidate.lower())
+    return candidate
+
+def render_xlsx(sections, counts, basename):
+    """Render a workbook with a summary sheet and one sheet per service in constant memory."""
+    try:
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font, PatternFill
+    except ImportError:
+        raise SystemExit("XLSX output requires openpyxl: pip install openpyxl")
+    filename = f"{basename}.xlsx"
+    wb = Workbook(write_only=True)
+    used = {'summary'}
+    summary = wb.create_sheet("Summary")
+    for label, key in COUNT_LABELS:
+        summary.append([label, counts[key]])
+    for title, header, rows in summary_tables(counts):
+        summary.append([])
+        summary.append([title])
+        summary.append([header, "Count"])
+        for value, n in rows:
+            summary.append([value, n])
+    header_font = Font(bold=True, color='FFFFFF')
+    header_fill = PatternFill('solid', fgColor='87CEEB')
+    for section in sections:
+        headers, rows = section_rows(section)
+        ws = wb.create_sheet(_sheet_title(section['title'], used))
+        header_cells = []
+        for header in headers + ["ID"]:
+            cell = WriteOnlyCell(ws, value=header)
+            cell.font = header_font
+            cell.fill = header_fill
+            header_cells.append(cell)
+        ws.append(header_cells)
+        for row, item in zip(rows, section['content']):
+            ws.append(row + (str(item.get('ID', 'N/A')),))
+    wb.save(filename)
+    return filename
+
+# Output formats selectable with --format: name -> renderer(sections, counts, basename) -> path
+RENDERERS = {
+    "docx": render_docx,
+    "jsonl": render_jsonl,
+    "csv": render_csv,
+    "md": render_markdown,
+    "html": render_html,
+    "xlsx": render_xlsx,
+}
+
+def render_outputs(sections, counts, formats, basename='asbuilt', stream_docx=False, render_workers=0, metrics=None):
+    """Render the processed sections in each requested format, each as a stage of metrics if given.
+
+    Returns the path written for each format.
+    """
+    paths = {}
+    for output_format in formats:
+        with metrics.stage(f"render {output_format}") if metrics else nullcontext():
+            if output_format == 'docx' and (stream_docx or render_workers > 1):
+                path = render_docx_streaming(sections, counts, basename, render_workers)
+            else:
+                path = RENDERERS[output_format](sections, counts, basename)
+        logger.info("Rendered %s output to %s", output_format, path)
+        paths[output_format] = path
+    return paths
@@ -0,0 +1,51 @@
+"""Azure service names, descriptions and document column headers per resource type."""
+
+# Mapping of resource types to Azure service names and descriptions
+RESOURCE_TYPE_DETAILS = {
+    "Microsoft.CognitiveServices/accounts": ("Azure Cognitive Services", "Provides AI and machine learning services."),
+    "Microsoft.Compute/virtualMachines": ("Azure Virtual Machines", "Scalable computing resources for running applications."),
+    "Microsoft.Network/virtualNetworks": ("Azure Virtual Networks", "Enables secure connections between Azure services."),
+    "Microsoft.Storage/storageAccounts": ("Azure Storage Accounts", "Scalable cloud storage solutions."),
+    "Microsoft.Web/sites": ("Azure App Service", "Platform for building and hosting web apps."),
+    "Microsoft.Sql/servers": ("Azure SQL Database", "Managed database service for SQL Server."),
+    "Microsoft.KeyVault/vaults": ("Azure Key Vault", "Securely stores and manages access to secrets."),
+    "Microsoft.ContainerRegistry/registries": ("Azure Container Registry", "Stores and manages container images."),
+    "Microsoft.Kubernetes/connectedClusters": ("Azure Arc-enabled Kubernetes", "Manages Kubernetes clusters across environments."),
+    "Microsoft.Network/publicIPAddresses": ("Azure Public IP Addresses", "Provides static and dynamic public IP addresses."),
+    "Microsoft.Network/networkSecurityGroups": ("Azure Network Security Groups", "Controls inbound and outbound traffic to resources."),
+    "Microsoft.Network/loadBalancers": ("Azure Load Balancers", "Distributes traffic among multiple servers."),
+    "Microsoft.Network/applicationGateways": ("Azure Application Gateways", "Manages application delivery and load balancing."),
+    "Microsoft.Network/dnszones": ("Azure DNS Zones", "Hosts DNS domains and manages DNS records."),
+    "Microsoft.Network/expressRouteCircuits": ("Azure ExpressRoute Circuits", "Private connections between on-premises networks and Azure."),
+    "Microsoft.Network/virtualNetworkGateways": ("Azure Virtual Network Gateways", "Connects on-premises networks to Azure VNets."),
+    "Microsoft.Network/routeTables": ("Azure Route Tables", "Defines routes for network traffic."),
+    "Microsoft.ContainerInstance/containerGroups": ("Azure Container Instances", "Runs containers without managing servers."),
+    "Microsoft.ContainerService/managedClusters": ("Azure Kubernetes Service (AKS)", "Managed Kubernetes service for containerized applications."),
+    "Microsoft.DocumentDB/databaseAccounts": ("Azure Cosmos DB", "Globally distributed multi-model database service."),
+    "Microsoft.EventHub/namespaces": ("Azure Event Hubs", "Big data streaming platform and event ingestion service."),
+    "Microsoft.Insights/components": ("Azure Application Insights", "Monitors and diagnoses application performance issues."),
+    "Microsoft.Logic/workflows": ("Azure Logic Apps", "Automates workflows and integrates apps and data."),
+    "Microsoft.MachineLearningServices/workspaces": ("Azure Machine Learning", "Platform for building and deploying machine learning models."),
+    "Microsoft.ManagedIdentity/userAssignedIdentities": ("Azure Managed Identities", "Provides identity management for Azure resources."),
+    "Microsoft.OperationalInsights/workspaces": ("Azure Log Analytics", "Collects and analyzes log data."),
+    "Microsoft.Relay/namespaces": ("Azure Relay", "Enables hybrid applications by bridging on-premises and cloud environments."),
+    "Microsoft.Search/searchServices": ("Azure Cognitive Search", "Search-as-a-service for building search experiences."),
+    "Microsoft.ServiceBus/namespaces": ("Azure Service Bus", "Fully managed enterprise message broker."),
+    "Microsoft.SignalRService/signalr": ("Azure SignalR Service", "Real-time messaging service for web applications."),
+    "Microsoft.Sql/servers/databases": ("Azure SQL Databases", "Managed relational database service."),
+    "Microsoft.StreamAnalytics/streamingjobs": ("Azure Stream Analytics", "Real-time data processing service."),
+    "Microsoft.Synapse/workspaces": ("Azure Synapse Analytics", "Analytics service that brings together big data and data warehousing."),
+    "Microsoft.Web/serverfarms": ("Azure App Service Plans", "Plans for hosting web apps, mobile apps, and API apps."),
+    # Add any other mappings as needed
+}
+
+# Define specific headers for each Azure service type
+SERVICE_HEADERS = {
+    "Azure Virtual Machines": ["Name", "Resource Group", "Location", "Size", "OS Type", "Tags"],
+    "Azure Virtual Networks": ["Name", "Resource Group", "Location", "Address Space", "Tags"],
+    "Azure Storage Accounts": ["Name", "Resource Group", "Location", "SKU", "Access Tier", "Tags"],
+    "Azure App Service": ["Name", "Resource Group", "Location", "App Service Plan", "State", "Tags"],
+    "Azure SQL Database": ["Name", "Resource Group", "Location", "Version", "State", "Tags"],
+    "Azure SQL Databases": ["Name", "Resource Group", "Location", "Database Edition", "Service Objective", "Tags"],
+    # Add more custom headers for other service types as needed
+}
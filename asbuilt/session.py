@@ -0,0 +1,392 @@
+"""ARM throttling, the shared HTTP transport and the process-wide credential."""
+import os
+import re
+import json
+import time
+import socket
+import logging
+import threading
+from .metrics import fetch_metrics
+# The Azure SDKs and requests are imported by the functions that use them
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of subscriptions fetched in parallel
+FETCH_MAX_WORKERS = int(os.getenv('AZURE_FETCH_MAX_WORKERS', '8'))
+
+# ARM read quotas: each subscription's bucket holds 250 requests and refills at 25 per second.
+# The tenant bucket caps the combined rate of all subscriptions fetched in parallel.
+ARM_SUBSCRIPTION_READS_RATE = 25.0
+
+ARM_SUBSCRIPTION_READS_BURST = 250
+
+ARM_TENANT_READS_RATE = float(os.getenv('ASBUILT_ARM_TENANT_READS_RATE', '100'))
+
+ARM_TENANT_READS_BURST = 500
+
+ARM_THROTTLE_BACKOFF = 5.0  # Seconds to wait after a 429 or 503 without Retry-After
+
+ENRICH_MAX_WORKERS = int(os.getenv('ASBUILT_ENRICH_MAX_WORKERS', '4'))
+
+# Token scope of Azure Resource Manager, which Resource Graph shares
+ARM_SCOPE = "https://management.azure.com/.default"
+
+TOKEN_REFRESH_MARGIN = 300  # Seconds before expiry at which a cached token is renewed
+
+# ARM endpoint of the management clients (default: Azure's); a plain-HTTP URL is a local stand-in such as asbuilt.fake_arm
+ARM_BASE_URL = os.getenv('ASBUILT_ARM_BASE_URL') or None
+
+TOKEN_CACHE_PATH = os.getenv('ASBUILT_TOKEN_CACHE', os.path.join(os.path.expanduser('~'), '.asbuilt', 'token_cache.bin'))
+
+# Every management client shares one connection pool; each fetch or enrich thread holds at most one connection
+HTTP_POOL_SIZE = int(os.getenv('ASBUILT_HTTP_POOL_SIZE', str(FETCH_MAX_WORKERS + ENRICH_MAX_WORKERS)))
+
+class RateLimiter:
+    """Token bucket shared by the threads that query one service.
+
+    acquire() takes a token, sleeping until one is available; tokens refill at
+    `rate` per second up to `burst`. The balance can go negative, which is how
+    pause() and limit() make every waiting thread back off together.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Take a token, sleeping until one is available; return the seconds slept."""
+        with self.lock:
+            self._refill()
+            wait = (1 - self.tokens) / self.rate if self.tokens < 1 else 0
+            # Claim the token now so threads queue behind each other instead of all waking together
+            self.tokens -= 1
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def limit(self, remaining):
+        """Lower the balance to a server-reported number of remaining requests."""
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.tokens, remaining)
+
+    def pause(self, seconds):
+        """Hand out no tokens for the given number of seconds, as after a Retry-After."""
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+def _retry_after(headers):
+    """Return the delay in seconds requested by a throttled response, or None."""
+    for header, scale in (('retry-after-ms', 0.001), ('x-ms-retry-after-ms', 0.001), ('Retry-After', 1)):
+        value = headers.get(header)
+        if value:
+            try:
+                return float(value) * scale
+            except ValueError:
+                pass  # An HTTP date, which ARM does not send
+    return None
+
+class ArmThrottle:
+    """The ARM read quotas of a run: one token bucket per subscription and one for the tenant.
+
+    Every request takes a token from both. Responses keep the buckets in step with
+    the x-ms-ratelimit-remaining-*-reads headers, and a 429 or 503 pauses the
+    bucket it was charged to for the Retry-After delay, so the other threads
+    fetching that subscription back off too.
+    """
+
+    def __init__(self, subscription_rate=ARM_SUBSCRIPTION_READS_RATE, subscription_burst=ARM_SUBSCRIPTION_READS_BURST,
+                 tenant_rate=ARM_TENANT_READS_RATE, tenant_burst=ARM_TENANT_READS_BURST):
+        self.subscription_rate = subscription_rate
+        self.subscription_burst = subscription_burst
+        self.tenant = RateLimiter(tenant_rate, tenant_burst)
+        self.subscriptions = {}
+        self.lock = threading.Lock()
+        self.throttled = 0
+
+    def subscription(self, sub_id):
+        """Return the bucket of a subscription, creating it on first use."""
+        with self.lock:
+            if sub_id not in self.subscriptions:
+                self.subscriptions[sub_id] = RateLimiter(self.subscription_rate, self.subscription_burst)
+            return self.subscriptions[sub_id]
+
+    def acquire(self, sub_id):
+        """Take a token from the tenant bucket and the subscription's; return the seconds slept."""
+        wait = self.tenant.acquire()
+        if sub_id:
+            wait += self.subscription(sub_id).acquire()
+        return wait
+
+    def observe(self, sub_id, response):
+        """Adjust the buckets from the rate-limit headers and status of a response."""
+        headers = response.headers
+        tenant_remaining = headers.get('x-ms-ratelimit-remaining-tenant-reads')
+        if tenant_remaining is not None:
+            self.tenant.limit(int(tenant_remaining))
+        subscription_remaining = headers.get('x-ms-ratelimit-remaining-subscription-reads')
+        if sub_id and subscription_remaining is not None:
+            self.subscription(sub_id).limit(int(subscription_remaining))
+        if response.status_code in (429, 503):
+            self.throttled += 1
+            delay = _retry_after(headers) or ARM_THROTTLE_BACKOFF
+            bucket = self.tenant if tenant_remaining == '0' or not sub_id else self.subscription(sub_id)
+            bucket.pause(delay)
+            logger.warning("ARM throttled a request for subscription %s (%s); pausing %gs.",
+                           sub_id or 'tenant', response.status_code, delay)
+
+_SUBSCRIPTION_IN_URL = re.compile(r'/subscriptions/([^/?]+)', re.IGNORECASE)
+
+class ArmThrottlingPolicy:
+    """Pipeline policy charging every ARM request attempt to an ArmThrottle.
+
+    It runs after the SDK's RetryPolicy, so retried attempts are rate limited too,
+    and the RetryPolicy still waits for Retry-After before resending. It follows
+    azure-core's HTTPPolicy protocol (`next` and `send`) without importing it.
+    """
+
+    def __init__(self, throttle):
+        self.next = None
+        self.throttle = throttle
+
+    def send(self, request):
+        match = _SUBSCRIPTION_IN_URL.search(request.http_request.url)
+        sub_id = match.group(1).lower() if match else None
+        wait = self.throttle.acquire(sub_id)
+        if wait:
+            fetch_metrics().add(sub_id or 'tenant', throttle_wait_seconds=wait)
+        response = self.next.send(request)
+        self.throttle.observe(sub_id, response.http_response)
+        return response
+
+class RequestMetricsPolicy:
+    """Pipeline policy counting every request attempt in fetch_metrics(), under its subscription or `scope`.
+
+    It runs after the SDK's RetryPolicy, so a request it sees again is a retry.
+    The time between a throttled attempt and its retry, the RetryPolicy's
+    Retry-After wait, is counted as a throttle wait. Place it before
+    ArmThrottlingPolicy, which counts its own token waits.
+    """
+
+    def __init__(self, scope='tenant'):
+        self.next = None
+        self.scope = scope
+
+    def send(self, request):
+        match = _SUBSCRIPTION_IN_URL.search(request.http_request.url)
+        scope = match.group(1).lower() if match else self.scope
+        counts = {"requests": 1}
+        previous = request.context.get('asbuilt_previous_attempt')
+        if previous:
+            finished, throttled = previous
+            counts["retries"] = 1
+            if throttled:
+                counts["throttle_wait_seconds"] = time.monotonic() - finished
+        throttled = False
+        try:
+            response = self.next.send(request)
+            http_response = response.http_response
+            throttled = http_response.status_code in (429, 503)
+            length = http_response.headers.get('Content-Length')
+            counts["bytes_received"] = int(length) if length else len(http_response.body() or b'')
+            counts["throttled"] = int(throttled)
+            return response
+        finally:
+            request.context['asbuilt_previous_attempt'] = (time.monotonic(), throttled)
+            fetch_metrics().add(scope, **counts)
+
+def keepalive_http_adapter(pool_size=HTTP_POOL_SIZE):
+    """Return a requests adapter with a sized pool of TCP keep-alive connections.
+
+    Retries are disabled, as in azure-core's own adapter, because the SDK's
+    RetryPolicy handles them.
+    """
+    from requests.adapters import HTTPAdapter
+    from urllib3.connection import HTTPConnection
+    from urllib3.util.retry import Retry
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size,
+                          max_retries=Retry(total=False, redirect=False, raise_on_status=False))
+    # HTTPAdapter takes no socket options, so rebuild its pool manager with them
+    adapter.init_poolmanager(4, pool_size,
+                             socket_options=HTTPConnection.default_socket_options + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)])
+    return adapter
+
+def connection_metrics(adapter):
+    """Return the connections opened and requests sent through an adapter's pools."""
+    pools = [adapter.poolmanager.pools[key] for key in adapter.poolmanager.pools.keys()]
+    opened = sum(pool.num_connections for pool in pools)
+    requests_sent = sum(pool.num_requests for pool in pools)
+    return {"connections_opened": opened, "requests": requests_sent, "connections_reused": requests_sent - opened}
+
+# Credentials DefaultAzureCredential tries that can be rebuilt without arguments when pinned from the token cache
+PINNABLE_CREDENTIALS = ('EnvironmentCredential', 'WorkloadIdentityCredential', 'ManagedIdentityCredential',
+                        'AzureCliCredential', 'AzurePowerShellCredential', 'AzureDeveloperCliCredential')
+
+class CachedTokenCredential:
+    """The credential DefaultAzureCredential resolved to, with its tokens shared by every client.
+
+    Tokens are reused until TOKEN_REFRESH_MARGIN seconds before they expire. Requests for
+    a new token are serialised, so parallel workers wait for one `az` call instead of
+    each spawning their own. With a persistence from msal-extensions, the credential
+    type and its tokens are also saved encrypted for the next run.
+    """
+
+    def __init__(self, credential, tokens=None, persistence=None):
+        self.credential = credential
+        self.tokens = tokens or {}  # Scopes -> AccessToken
+        self.persistence = persistence
+        self.lock = threading.Lock()
+
+    def get_token(self, *scopes, **kwargs):
+        if kwargs.get('claims') or kwargs.get('tenant_id'):
+            # Claims challenges and other tenants need a fresh token from the credential itself
+            return self.credential.get_token(*scopes, **kwargs)
+        with self.lock:
+            token = self.tokens.get(scopes)
+            if token is None or token.expires_on - TOKEN_REFRESH_MARGIN < time.time():
+                token = self.credential.get_token(*scopes, **kwargs)
+                self.tokens[scopes] = token
+                self.save()
+            return token
+
+    def save(self):
+        """Save the credential type and tokens to the encrypted token cache, if there is one."""
+        if self.persistence is None:
+            return
+        state = {
+            "credential": type(self.credential).__name__,
+            "tokens": [[list(scopes), token.token, token.expires_on] for scopes, token in self.tokens.items()],
+        }
+        try:
+            self.persistence.save(json.dumps(state))
+        except Exception as e:
+            logger.warning("Error saving the token cache: %s", e)
+
+    @classmethod
+    def load(cls, persistence):
+        """Rebuild the pinned credential and its unexpired tokens from the token cache, or return None."""
+        try:
+            state = json.loads(persistence.load())
+        except Exception:
+            return None  # No cache yet, or one that cannot be read
+        if state.get("credential") not in PINNABLE_CREDENTIALS:
+            return None
+        import azure.identity
+        from azure.core.credentials import AccessToken
+        credential_type = getattr(azure.identity, state["credential"])
+        tokens = {
+            tuple(scopes): AccessToken(token, expires_on) for scopes, token, expires_on in state.get("tokens", [])
+            if expires_on - TOKEN_REFRESH_MARGIN > time.time()
+        }
+        return cls(credential_type(), tokens, persistence)
+
+def _token_persistence(path):
+    """Return msal-extensions' encrypted persistence for the token cache, or None if it is unavailable."""
+    try:
+        from msal_extensions import build_encrypted_persistence
+    except ImportError:
+        logger.warning("The token cache needs msal-extensions (pip install msal-extensions); not caching tokens.")
+        return None
+    try:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        return build_encrypted_persistence(path)
+    except Exception as e:
+        # There is no unencrypted fallback: without DPAPI, Keychain or libsecret the cache stays off
+        logger.warning("No encrypted storage available for the token cache; not caching tokens: %s", str(e).splitlines()[0])
+        return None
+
+def resolve_credential(persistence=None):
+    """Resolve DefaultAzureCredential once, returning the credential that succeeded with an ARM token.
+
+    The pinned credential from the token cache is tried first, so a repeated run with
+    a cached token does not probe the chain or call Azure at all.
+    """
+    start = time.perf_counter()
+    if persistence is not None:
+        cached = CachedTokenCredential.load(persistence)
+        if cached is not None:
+            try:
+                cached.get_token(ARM_SCOPE)
+                logger.info("Using cached %s token (%.2fs).", type(cached.credential).__name__, time.perf_counter() - start)
+                return cached
+            except Exception as e:
+                logger.warning("Cached %s failed; probing DefaultAzureCredential: %s", type(cached.credential).__name__, e)
+    from azure.core.exceptions import ClientAuthenticationError
+    from azure.identity import DefaultAzureCredential
+    chain = DefaultAzureCredential()
+    try:
+        token = chain.get_token(ARM_SCOPE)
+    except ClientAuthenticationError as e:
+        raise SystemExit(f"Could not authenticate to Azure with DefaultAzureCredential: {e}")
+    # Pin the link of the chain that worked, so later tokens skip the probe
+    credential = getattr(chain, '_successful_credential', None) or chain
+    resolved = CachedTokenCredential(credential, {(ARM_SCOPE,): token}, persistence)
+    resolved.save()
+    logger.info("Authenticated with %s (%.2fs).", type(credential).__name__, time.perf_counter() - start)
+    return resolved
+
+# Process-wide credential and transport, created on first use and shared by every client
+_credential = None
+
+_http_transport = None
+
+def azure_credential(token_cache=None):
+    """Return the credential shared by every client, resolved and holding an ARM token.
+
+    It is resolved on first use, before any client fans out, with an optional
+    encrypted token cache file that persists it across runs.
+    """
+    global _credential
+    if _credential is None:
+        _credential = resolve_credential(_token_persistence(token_cache) if token_cache else None)
+    return _credential
+
+class AnonymousCredential:
+    """Credential for a plain-HTTP ARM endpoint, such as asbuilt.fake_arm, that takes no token."""
+
+    def get_token(self, *scopes, **kwargs):
+        from azure.core.credentials import AccessToken
+        return AccessToken('', int(time.time()) + 3600)
+
+def local_endpoint(base_url):
+    """Return whether base_url is a local stand-in for ARM, such as asbuilt.fake_arm, served over plain http://."""
+    return bool(base_url) and base_url.lower().startswith('http://')
+
+def management_client_options(base_url=None, token_cache=None):
+    """Return the credential and the client options for the ARM endpoint at base_url, or Azure's if it is None.
+
+    An http:// endpoint is a local stand-in: the credential chain is not probed,
+    and its clients send no bearer token, which azure-core refuses to send without TLS.
+    """
+    if local_endpoint(base_url):
+        from azure.core.pipeline.policies import SansIOHTTPPolicy
+        return AnonymousCredential(), {"base_url": base_url, "authentication_policy": SansIOHTTPPolicy()}
+    return azure_credential(token_cache), ({"base_url": base_url} if base_url else {})
+
+def http_transport():
+    """Return the transport shared by every client, so connections are pooled and kept alive across subscriptions."""
+    global _http_transport
+    if _http_transport is None:
+        import requests
+        from azure.core.pipeline.transport import RequestsTransport
+        session = requests.Session()
+        adapter = keepalive_http_adapter()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        _http_transport = RequestsTransport(session=session, session_owner=False)
+    return _http_transport
+
+def http_connection_metrics():
+    """Return the connection pool metrics of the shared transport."""
+    if _http_transport is None:
+        return {"connections_opened": 0, "requests": 0, "connections_reused": 0}
+    return connection_metrics(_http_transport.session.get_adapter('https://'))
@@ -0,0 +1,116 @@
+"""Compressed on-disk inventory snapshots keyed by subscription set."""
+import os
+import glob
+import gzip
+import json
+import time
+import hashlib
+import logging
+from datetime import datetime, timezone
+from .process import set_address_spaces, vnet_address_prefixes
+from .records import ResourceRecord
+from .spool import record_batches
+
+logger = logging.getLogger(__name__)
+
+# Inventory snapshots let document regeneration skip Azure entirely
+SNAPSHOT_VERSION = 4
+
+SNAPSHOT_DIR = os.getenv('ASBUILT_SNAPSHOT_DIR', 'snapshots')
+
+SNAPSHOT_TTL_HOURS = float(os.getenv('ASBUILT_SNAPSHOT_TTL_HOURS', '24'))
+
+SNAPSHOT_KEEP = 3  # Snapshots kept per subscription set
+
+SNAPSHOT_BATCH = 1000  # Records per line of a snapshot, so it can be read back a batch at a time
+
+# What load_snapshot raises for an unreadable, truncated or other-version snapshot
+SNAPSHOT_ERRORS = (OSError, EOFError, ValueError, KeyError)
+
+def snapshot_key(subscription_ids, source=None):
+    """Return a stable key identifying a set of subscription IDs fetched from a source.
+
+    The default source, Azure with enrichment, is None and leaves the key as it was.
+    """
+    normalized = ','.join(sorted(sub_id.strip().lower() for sub_id in subscription_ids))
+    if source:
+        normalized += '|' + source
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()[:16]
+
+def find_latest_snapshot(subscription_ids, directory=SNAPSHOT_DIR, source=None):
+    """Return the path of the newest snapshot for the subscription set and source, or None."""
+    paths = sorted(glob.glob(os.path.join(directory, f"{snapshot_key(subscription_ids, source)}-*.json.gz")))
+    return paths[-1] if paths else None
+
+def snapshot_age_hours(path):
+    """Return the age of a snapshot file in hours."""
+    return (time.time() - os.path.getmtime(path)) / 3600
+
+def write_snapshot_json(f, header, resources, network_details):
+    """Write a snapshot as JSON lines: the header, the network details, then batches of one type's records.
+
+    Nothing is built for the whole inventory, and load_snapshot reads the records
+    back a line at a time.
+    """
+    encode = json.JSONEncoder(separators=(',', ':'), default=str).encode
+    f.write(encode(header) + '\n')
+    f.write(encode({"network_details": network_details}) + '\n')
+    for resource_type, records in resources.items():
+        for batch in record_batches(records):
+            for start in range(0, len(batch), SNAPSHOT_BATCH):
+                f.write(encode({"type": resource_type, "resources": [record.to_dict() for record in batch[start:start + SNAPSHOT_BATCH]]})
+                        + '\n')
+
+def save_snapshot(subscription_ids, resources, network_details, directory=SNAPSHOT_DIR, keep=SNAPSHOT_KEEP, fetched_at=None, source=None):
+    """Persist the fetched inventory as a compressed, versioned snapshot and prune old ones."""
+    os.makedirs(directory, exist_ok=True)
+    created = datetime.now(timezone.utc)
+    fetched_at = fetched_at or created
+    key = snapshot_key(subscription_ids, source)
+    path = os.path.join(directory, f"{key}-{created.strftime('%Y%m%dT%H%M%S%fZ')}.json.gz")
+    header = {
+        "version": SNAPSHOT_VERSION,
+        "created": created.isoformat(),
+        "fetched_at": fetched_at.isoformat(),  # When fetching started, the baseline for incremental runs
+        "subscription_ids": list(subscription_ids),
+        "source": source,
+    }
+    # Write to a temporary file first so an interrupted run never leaves a truncated snapshot
+    tmp_path = path + '.tmp'
+    with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=6) as f:
+        write_snapshot_json(f, header, resources, network_details)
+    os.replace(tmp_path, path)
+    logger.info("Inventory snapshot saved as %s", path)
+
+    for old_path in sorted(glob.glob(os.path.join(directory, f"{key}-*.json.gz")))[:-keep]:
+        os.remove(old_path)
+        logger.debug("Removed old inventory snapshot %s", old_path)
+    return path
+
+def load_snapshot(path, spooler=None):
+    """Load an inventory snapshot, returning (resources, network_details, snapshot).
+
+    The records are read a batch at a time; with a spooler, each type's records go
+    to a spool rather than a list, so only a spool buffer per type stays in memory.
+    The network details come first, so VNet address spaces are set as the VNets
+    are read, as a fetch sets them before spooled records are spilled.
+    """
+    new_list = spooler or (lambda resource_type: [])
+    resources = {}
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        snapshot = json.loads(f.readline())
+        if snapshot.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version {snapshot.get('version')} in {path}; expected {SNAPSHOT_VERSION}.")
+        network_details = json.loads(f.readline())["network_details"]
+        vnet_prefixes = vnet_address_prefixes(network_details)
+        for line in f:
+            batch = json.loads(line)
+            resource_type = batch["type"]
+            records = [ResourceRecord.from_dict(resource) for resource in batch["resources"]]
+            if resource_type == "Microsoft.Network/virtualNetworks":
+                set_address_spaces(records, vnet_prefixes)
+            if resource_type not in resources:
+                resources[resource_type] = new_list(resource_type)
+            resources[resource_type].extend(records)
+    logger.info("Loaded inventory snapshot %s created %s.", path, snapshot['created'])
+    return resources, network_details, snapshot
@@ -0,0 +1,181 @@
+"""Bounded per-type record buffers that spill to disk, so large estates stream through the pipeline."""
+import os
+import pickle
+import shutil
+import logging
+import tempfile
+import threading
+from operator import attrgetter
+from .records import ResourceRecord
+
+logger = logging.getLogger(__name__)
+
+# Records of one resource type held in memory before older ones are spilled to disk
+SPOOL_BUFFER = int(os.getenv('ASBUILT_SPOOL_BUFFER', '5000'))
+
+# Directory for the spill files of a run (default: the system temporary directory)
+SPOOL_DIR = os.getenv('ASBUILT_SPOOL_DIR') or None
+
+# Spilled batches are pickled as one tuple per ResourceRecord field, which is about
+# twice as fast to write and read back as pickling the records themselves
+_RECORD_FIELDS = attrgetter(*ResourceRecord.FIELDS)
+
+def record_batches(records):
+    """Yield the records of a list or a spool as lists that are already in memory."""
+    batches = getattr(records, 'batches', None)
+    return batches() if batches else (records,)
+
+class Spooler:
+    """Creates the record spools of a run and owns the directory their batches spill to.
+
+    prepare(resource_type, records, whole) is called on every batch of records
+    before it is spilled, and on the records left in memory when a spool is sealed;
+    whole is true when those are all of the spool's records. It fills in the values
+    that would otherwise be set on records already written to disk, such as the
+    enriched detail columns.
+    """
+
+    def __init__(self, limit=SPOOL_BUFFER, directory=SPOOL_DIR, prepare=None):
+        self.limit = max(1, limit)
+        self.directory = directory
+        self.prepare = prepare
+        self.path = None  # Created with the first spilled batch
+        self.spilled = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, resource_type):
+        """Return a new, empty spool for a resource type."""
+        return RecordSpool(self, resource_type)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __getstate__(self):
+        # Render worker processes only read spilled batches back
+        return {"limit": self.limit, "directory": self.directory, "prepare": None, "path": self.path, "spilled": self.spilled}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def prepare_batch(self, resource_type, records, whole=False):
+        if self.prepare and records:
+            self.prepare(resource_type, records, whole)
+
+    def spill(self, records):
+        """Write a batch of records to a new spill file and return its path."""
+        with self.lock:
+            if self.path is None:
+                self.path = tempfile.mkdtemp(prefix='asbuilt-spool-', dir=self.directory)
+                logger.info("Spilling resource records beyond %s per type to %s.", self.limit, self.path)
+            self.spilled += len(records)
+            fd, path = tempfile.mkstemp(suffix='.pickle', dir=self.path)
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(list(zip(*map(_RECORD_FIELDS, records))), f, pickle.HIGHEST_PROTOCOL)
+        return path
+
+    @staticmethod
+    def load(path):
+        """Read a spilled batch of records back."""
+        with open(path, 'rb') as f:
+            return ResourceRecord.from_columns(*pickle.load(f))
+
+    def seal(self, resources):
+        """Prepare the in-memory records of every spool in a resources dict, once fetching is done."""
+        for records in resources.values():
+            if isinstance(records, RecordSpool):
+                records.seal()
+
+    def close(self):
+        """Remove the spill files."""
+        if self.path:
+            logger.debug("Removing %s spilled resource records from %s.", self.spilled, self.path)
+            shutil.rmtree(self.path, ignore_errors=True)
+            self.path = None
+
+class RecordSpool:
+    """The records of one resource type: the newest in memory, earlier batches spilled to disk.
+
+    A spool is used like the list it replaces: append and extend while fetching,
+    then len() and any number of independent iterations, which read the spilled
+    batches back one at a time. Extending a spool with another spool adopts its
+    spilled batches without reading them. Appends are thread-safe, so parallel
+    fetches can share one spool per type; a full batch is prepared and written
+    outside the lock, in the place it was cut from.
+    """
+
+    def __init__(self, spooler, resource_type):
+        self.spooler = spooler
+        self.resource_type = resource_type
+        self.segments = []  # Paths of spilled batches, in record order; None while a batch is being written
+        self.buffer = []
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def append(self, record):
+        with self.lock:
+            self.buffer.append(record)
+            self.count += 1
+            if len(self.buffer) < self.spooler.limit:
+                return
+            full = self._cut()
+        self._spill(*full)
+
+    def extend(self, records):
+        full = []
+        with self.lock:
+            if isinstance(records, RecordSpool):
+                if records.segments:
+                    # Keep the record order: what is already buffered goes before the adopted batches
+                    if self.buffer:
+                        full.append(self._cut())
+                    self.segments.extend(records.segments)
+                    self.count += records.count - len(records.buffer)
+                records = records.buffer
+            for record in records:
+                self.buffer.append(record)
+                self.count += 1
+                if len(self.buffer) >= self.spooler.limit:
+                    full.append(self._cut())
+        for slot, batch in full:
+            self._spill(slot, batch)
+
+    def _cut(self):
+        """Take the buffered records as the next batch and reserve its segment; call with the lock held."""
+        batch, self.buffer = self.buffer, []
+        self.segments.append(None)
+        return len(self.segments) - 1, batch
+
+    def _spill(self, slot, batch):
+        self.spooler.prepare_batch(self.resource_type, batch)
+        self.segments[slot] = self.spooler.spill(batch)
+
+    def seal(self):
+        """Prepare the records still in memory; call once, after the last append."""
+        self.spooler.prepare_batch(self.resource_type, self.buffer, whole=not self.segments)
+
+    def batches(self):
+        """Yield the records a batch at a time, spilled batches first."""
+        for path in self.segments:
+            yield self.spooler.load(path)
+        if self.buffer:
+            yield self.buffer
+
+    def __iter__(self):
+        for batch in self.batches():
+            yield from batch
+
+    def __len__(self):
+        return self.count
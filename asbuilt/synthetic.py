@@ -0,0 +1,265 @@
+"""Deterministic synthetic Azure estates, for benchmarks and for runs without a tenant.
+
+    python -m asbuilt.synthetic --resources 100000 --subscriptions 20 --output estate.json
+
+writes a Resource Graph fixture that `asbuilt --graph-fixture estate.json` documents
+offline, with every subscription ID passed to it by --subscription-id.
+"""
+import json
+import argparse
+from bisect import bisect
+from itertools import accumulate
+from .services import RESOURCE_TYPE_DETAILS
+from .records import ResourceRecord
+from .collect import vnet_details
+from .graph import _graph_row_to_dict
+
+# Relative share of each resource type in an estate; the other RESOURCE_TYPE_DETAILS types get 1
+TYPE_WEIGHTS = {
+    "Microsoft.Compute/virtualMachines": 12,
+    "Microsoft.Compute/disks": 16,
+    "Microsoft.Storage/storageAccounts": 8,
+    "Microsoft.Network/networkSecurityGroups": 6,
+    "Microsoft.Network/publicIPAddresses": 6,
+    "Microsoft.Network/virtualNetworks": 3,
+    "Microsoft.Web/sites": 5,
+    "Microsoft.Web/serverfarms": 3,
+    "Microsoft.Sql/servers": 2,
+    "Microsoft.Sql/servers/databases": 4,
+    "Microsoft.KeyVault/vaults": 3,
+    "Microsoft.ManagedIdentity/userAssignedIdentities": 3,
+    "Microsoft.Insights/components": 2,
+}
+
+LOCATIONS = ("eastus", "eastus2", "westeurope", "northeurope", "uksouth", "australiaeast", "southeastasia", "centralus")
+
+TAG_VALUES = {
+    "environment": ("prod", "test", "dev", "staging"),
+    "owner": tuple(f"team{n}" for n in range(20)),
+    "costCenter": tuple(f"cc-{n:04d}" for n in range(50)),
+    "application": tuple(f"app{n}" for n in range(100)),
+    "department": ("finance", "sales", "engineering", "operations", "hr"),
+    "criticality": ("high", "medium", "low"),
+    "dataClassification": ("public", "internal", "confidential"),
+    "managedBy": ("terraform", "bicep", "portal"),
+}
+
+# Resource type -> (SKU names, kind values); None when the listing returns no SKU or kind
+TYPE_SKUS = {
+    "Microsoft.Compute/disks": (("Premium_LRS", "StandardSSD_LRS", "Standard_LRS"), None),
+    "Microsoft.Storage/storageAccounts": (("Standard_LRS", "Standard_GRS", "Premium_LRS"), ("StorageV2", "BlobStorage")),
+    "Microsoft.Network/publicIPAddresses": (("Standard", "Basic"), None),
+    "Microsoft.Network/loadBalancers": (("Standard", "Basic"), None),
+    "Microsoft.Web/sites": (None, ("app", "functionapp", "app,linux")),
+    "Microsoft.Web/serverfarms": (("P1v3", "S1", "B1"), ("app", "linux")),
+    "Microsoft.KeyVault/vaults": (("standard", "premium"), None),
+    "Microsoft.ContainerRegistry/registries": (("Basic", "Standard", "Premium"), None),
+    "Microsoft.Sql/servers/databases": (("GP_Gen5_2", "S0", "BC_Gen5_4"), ("v12.0,user",)),
+    "Microsoft.CognitiveServices/accounts": (("S0",), ("OpenAI", "TextAnalytics")),
+}
+
+VM_SIZES = ("Standard_D2s_v5", "Standard_D4s_v5", "Standard_B2ms", "Standard_E8s_v5")
+
+_PREFIX_SEGMENT = 256  # VNet n of a subscription gets 10.(n // 256).(n % 256).0/24
+
+_MASK64 = 2 ** 64 - 1
+
+def _draws(seed, index):
+    """Yield an endless stream of 64-bit values determined by the seed and the index alone.
+
+    This is SplitMix64: a few integer operations per value, where seeding a
+    random.Random for every resource costs more than building the resource.
+    """
+    x = (seed * 0x9E3779B97F4A7C15 + index) & _MASK64
+    while True:
+        x = (x + 0x9E3779B97F4A7C15) & _MASK64
+        z = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK64
+        yield z ^ (z >> 31)
+
+class _Draw:
+    """Choices from the value stream of one resource."""
+    __slots__ = ('values',)
+
+    def __init__(self, seed, index):
+        self.values = _draws(seed, index)
+
+    def below(self, n):
+        return next(self.values) % n
+
+    def choice(self, options):
+        return options[next(self.values) % len(options)]
+
+    def chance(self, probability):
+        return next(self.values) < probability * 2 ** 64
+
+class SyntheticEstate:
+    """A synthetic tenant: resources of a realistic type mix spread over subscriptions, with tagged resources and VNets.
+
+    Resource i belongs to subscription i % subscriptions and is a function of the
+    seed and i alone, so the same arguments always give the same estate and any
+    resource or page of resources is built on demand; an estate of a million
+    resources is never held in memory. Resources come in the REST JSON shape of
+    resources.list(), Resource Graph rows, or ResourceRecords.
+    """
+
+    def __init__(self, resources=1000, subscriptions=10, resource_groups=20, seed=0, type_weights=None, tag_keys=6):
+        self.count = resources
+        self.subscriptions = max(1, subscriptions)
+        self.resource_groups = max(1, resource_groups)
+        self.seed = seed
+        self.subscription_ids = [f"{seed % 2 ** 32:08x}-0000-4000-8000-{n:012x}" for n in range(self.subscriptions)]
+        weights = {resource_type: 1 for resource_type in RESOURCE_TYPE_DETAILS}
+        weights.update(TYPE_WEIGHTS if type_weights is None else type_weights)
+        self.types = [resource_type for resource_type, weight in weights.items() if weight > 0]
+        self.cumulative_weights = list(accumulate(weights[resource_type] for resource_type in self.types))
+        self.total_weight = self.cumulative_weights[-1]
+        self.tag_keys = list(TAG_VALUES)[:tag_keys]
+        self._vnets = None
+
+    def _type(self, draw):
+        return self.types[bisect(self.cumulative_weights, draw.below(self.total_weight))]
+
+    def resource_type(self, index):
+        """Return the type of resource `index`, without building the rest of it."""
+        return self._type(_Draw(self.seed, index))
+
+    def resource(self, index):
+        """Return resource `index` in the REST JSON shape of resources.list(), with its properties."""
+        rng = _Draw(self.seed, index)
+        resource_type = self._type(rng)
+        sub_id = self.subscription_ids[index % self.subscriptions]
+        name = f"{resource_type.rsplit('/', 1)[1][:12].lower()}-{index:07d}"
+        resource_group = f"rg-{rng.below(self.resource_groups):03d}"
+        if resource_type == "Microsoft.Sql/servers/databases":
+            parent = f"sql-{index % 997:07d}"
+            resource_id = (f"/subscriptions/{sub_id}/resourceGroups/{resource_group}/providers/Microsoft.Sql/servers/{parent}"
+                           f"/databases/{name}")
+            name = f"{parent}/{name}"
+        else:
+            resource_id = f"/subscriptions/{sub_id}/resourceGroups/{resource_group}/providers/{resource_type}/{name}"
+        resource = {"id": resource_id, "name": name, "type": resource_type, "location": rng.choice(LOCATIONS)}
+        skus, kinds = TYPE_SKUS.get(resource_type, (None, None))
+        if kinds:
+            resource["kind"] = rng.choice(kinds)
+        if skus:
+            resource["sku"] = {"name": rng.choice(skus)}
+            if resource_type == "Microsoft.Sql/servers/databases":
+                resource["sku"]["tier"] = {"G": "GeneralPurpose", "S": "Standard", "B": "BusinessCritical"}[resource["sku"]["name"][0]]
+        tag_count = rng.below(len(self.tag_keys) + 1)
+        if tag_count:
+            first = rng.below(len(self.tag_keys))
+            keys = (self.tag_keys + self.tag_keys)[first:first + tag_count]
+            resource["tags"] = {key: rng.choice(TAG_VALUES[key]) for key in keys}
+        properties = self._properties(rng, resource_type, index, sub_id, resource_group)
+        if properties:
+            resource["properties"] = properties
+        return resource
+
+    def _properties(self, rng, resource_type, index, sub_id, resource_group):
+        """Return the properties the enrichers and the VNet listing read, for the types that have them."""
+        if resource_type == "Microsoft.Compute/virtualMachines":
+            return {"hardwareProfile": {"vmSize": rng.choice(VM_SIZES)},
+                    "storageProfile": {"osDisk": {"osType": rng.choice(("Linux", "Windows"))}}}
+        if resource_type == "Microsoft.Storage/storageAccounts":
+            return {"accessTier": rng.choice(("Hot", "Cool"))}
+        if resource_type == "Microsoft.Web/sites":
+            return {"serverFarmId": f"/subscriptions/{sub_id}/resourceGroups/{resource_group}/providers/Microsoft.Web/serverfarms/"
+                                    f"plan-{index % 101:03d}",
+                    "state": rng.choice(("Running", "Stopped"))}
+        if resource_type == "Microsoft.Sql/servers":
+            return {"version": "12.0", "state": "Ready"}
+        if resource_type == "Microsoft.Sql/servers/databases":
+            return {"currentServiceObjectiveName": rng.choice(("GP_Gen5_2", "S0", "BC_Gen5_4"))}
+        if resource_type == "Microsoft.Network/virtualNetworks":
+            return self._vnet_properties(rng, index, sub_id)
+        return None
+
+    def _vnet_properties(self, rng, index, sub_id):
+        # Prefixes follow the resource index, so VNets in a subscription rarely overlap
+        n = index // self.subscriptions
+        prefix = f"10.{n // _PREFIX_SEGMENT % 256}.{n % _PREFIX_SEGMENT}"
+        properties = {
+            "addressSpace": {"addressPrefixes": [f"{prefix}.0/24"]},
+            "subnets": [
+                {"name": f"snet-{s}", "properties": {"addressPrefix": f"{prefix}.{s * 64}/26"}}
+                for s in range(1 + rng.below(4))
+            ],
+            "virtualNetworkPeerings": [],
+        }
+        if rng.chance(0.5):
+            properties["virtualNetworkPeerings"].append({
+                "name": "peer-hub",
+                "properties": {
+                    "remoteVirtualNetwork": {"id": f"/subscriptions/{sub_id}/resourceGroups/rg-network/providers/"
+                                                   "Microsoft.Network/virtualNetworks/hub"},
+                    "peeringState": "Connected",
+                },
+            })
+        return properties
+
+    def subscription_resource_count(self, subscription):
+        """Return how many resources subscription number `subscription` has."""
+        return len(range(subscription, self.count, self.subscriptions))
+
+    def subscription_resources(self, subscription, start=0, stop=None):
+        """Yield resources start to stop of subscription number `subscription`, as resources.list() pages them."""
+        for index in range(subscription, self.count, self.subscriptions)[start:stop]:
+            yield self.resource(index)
+
+    def resources(self):
+        """Yield every resource of the estate, in index order."""
+        for index in range(self.count):
+            yield self.resource(index)
+
+    def virtual_networks(self, subscription):
+        """Return the VNets of subscription number `subscription` in the REST JSON shape of virtual_networks.list_all()."""
+        if self._vnets is None:
+            vnet_type = "Microsoft.Network/virtualNetworks"
+            self._vnets = [[] for _ in range(self.subscriptions)]
+            for index in range(self.count):
+                if self.resource_type(index) == vnet_type:
+                    self._vnets[index % self.subscriptions].append(index)
+        return [self.resource(index) for index in self._vnets[subscription]]
+
+    def records(self):
+        """Yield a ResourceRecord per resource, as the ARM fetch builds them from the listing."""
+        for resource in self.resources():
+            yield ResourceRecord.from_dict(resource)
+
+    def network_details(self):
+        """Return the network details of the estate, as fetch_network_details returns them."""
+        return {'virtualNetworks': {
+            sub_id: [vnet_details(_graph_row_to_dict(vnet)) for vnet in self.virtual_networks(n)]
+            for n, sub_id in enumerate(self.subscription_ids)
+        }}
+
+    def graph_rows(self):
+        """Yield every resource as a Resource Graph row, with the lower-cased type and subscriptionId the service returns."""
+        for resource in self.resources():
+            yield {**resource, "type": resource["type"].lower(), "subscriptionId": resource["id"].split('/')[2]}
+
+def write_graph_fixture(estate, path):
+    """Write an estate as a Resource Graph fixture for --graph-fixture, one row at a time."""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{"rows":[')
+        for i, row in enumerate(estate.graph_rows()):
+            f.write((',\n' if i else '\n') + json.dumps(row, separators=(',', ':')))
+        f.write('\n]}\n')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m asbuilt.synthetic', description="Write a synthetic estate as a Resource Graph fixture.")
+    parser.add_argument('--resources', type=int, default=1000, help="Number of resources (default: 1000).")
+    parser.add_argument('--subscriptions', type=int, default=10, help="Number of subscriptions (default: 10).")
+    parser.add_argument('--resource-groups', type=int, default=20, help="Resource groups per subscription (default: 20).")
+    parser.add_argument('--seed', type=int, default=0, help="Seed; the same seed always gives the same estate (default: 0).")
+    parser.add_argument('--output', default='synthetic_estate.json', metavar='FILE',
+                        help="Fixture file to write (default: synthetic_estate.json).")
+    args = parser.parse_args(argv)
+    estate = SyntheticEstate(args.resources, args.subscriptions, args.resource_groups, args.seed)
+    write_graph_fixture(estate, args.output)
+    print(f"Wrote {args.resources} resources to {args.output}. Document them with:")
+    print(f"asbuilt --graph-fixture {args.output} " + ' '.join(f"--subscription-id {sub_id}" for sub_id in estate.subscription_ids))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+"""Word document generation, including the streaming and multi-process writers."""
+import io
+import copy
+import re
+import zipfile
+import logging
+from .process import COUNT_LABELS, SUMMARY_TEXT, cell_text, section_table, summary_tables
+# python-docx and lxml are imported by the functions that use them
+
+logger = logging.getLogger(__name__)
+
+# Characters python-docx turns into w:tab/w:br elements when setting run text
+_SPECIAL_RUN_CHARS = re.compile(r'[\t\n\r]')
+
+def add_custom_styles(doc):
+    """Add custom styles to the Word document."""
+    from docx.shared import Pt, RGBColor
+    style = doc.styles['Normal']
+    font = style.font
+    font.name = 'Aptos'  # Ensure 'Aptos' font is installed
+    font.size = Pt(12)
+    font.color.rgb = RGBColor(0, 0, 0)  # Black color
+
+def set_table_borders(table):
+    """Set borders for all cells in a table and add outside borders."""
+    from docx.oxml import OxmlElement
+    from docx.oxml.ns import qn
+    tbl = table._tbl
+    tblBorders = OxmlElement('w:tblBorders')
+    for border_name in ('top', 'left', 'bottom', 'right', 'insideH', 'insideV'):
+        border = OxmlElement(f'w:{border_name}')
+        border.set(qn('w:val'), 'single')
+        border.set(qn('w:sz'), '6')
+        border.set(qn('w:space'), '0')
+        border.set(qn('w:color'), 'auto')
+        tblBorders.append(border)
+    tbl.tblPr.append(tblBorders)
+
+def format_table_header(table, headers):
+    """Format table header with bold letters, white font color, and a light blue background."""
+    from docx.oxml import OxmlElement
+    from docx.oxml.ns import qn
+    from docx.shared import Pt, RGBColor
+    hdr_cells = table.rows[0].cells
+    for idx, header in enumerate(headers):
+        hdr_cells[idx].text = header
+        # Set the text format
+        cell_para = hdr_cells[idx].paragraphs[0]
+        cell_run = cell_para.runs[0]
+        cell_run.bold = True
+        cell_run.font.color.rgb = RGBColor(255, 255, 255)  # White font
+        cell_run.font.size = Pt(12)
+        
+        # Set the cell background color
+        cell_tcPr = hdr_cells[idx]._element.get_or_add_tcPr()
+        cell_shading = OxmlElement('w:shd')
+        cell_shading.set(qn('w:fill'), '87CEEB')  # Light sky blue background
+        cell_tcPr.append(cell_shading)
+
+# Clark names of w:t and xml:space, as docx.oxml.ns.qn() spells them
+_W_T = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}t'
+
+_XML_SPACE = '{http://www.w3.org/XML/1998/namespace}space'
+
+def table_row_template(table):
+    """Build a w:tr with one w:tc per grid column, each holding a single w:p/w:r/w:t.
+
+    The cell properties match what table.add_row() creates, so cloning this
+    template once per row replaces the per-cell python-docx proxy calls.
+    """
+    from docx.oxml import OxmlElement
+    tr = OxmlElement('w:tr')
+    for grid_col in table._tbl.tblGrid.gridCol_lst:
+        tc = tr.add_tc()
+        tc.width = grid_col.w
+        tc.p_lst[0].add_r().append(OxmlElement('w:t'))
+    return tr
+
+def build_table_row(template, values):
+    """Clone a row template and fill its cells with the given values."""
+    tr = copy.deepcopy(template)
+    for t, value in zip(tr.iter(_W_T), values):
+        if not isinstance(value, str):
+            # Tags and other non-string values read as they do in the other formats
+            value = cell_text(value)
+        if value and not _SPECIAL_RUN_CHARS.search(value):
+            t.text = value
+            if value != value.strip():
+                t.set(_XML_SPACE, 'preserve')
+        else:
+            # Empty or tab/newline-bearing values take python-docx's run text path
+            r = t.getparent()
+            r.remove(t)
+            r.text = value
+    return tr
+
+def add_table_rows(table, rows):
+    """Append rows of cell values to a table in bulk."""
+    tbl = table._tbl
+    template = table_row_template(table)
+    for values in rows:
+        tbl.append(build_table_row(template, values))
+
+def add_front_matter(doc, sections, counts):
+    """Add the title page, summary, total counts and table of contents to the document."""
+    from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+    # Title Page
+    title_page = doc.add_paragraph()
+    title_page.add_run("As-Built Document").bold = True
+    title_page.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+    doc.add_paragraph("\n\n\n\n\n")  # Add some space
+
+    # Summary Section
+    doc.add_heading('Summary', level=1)
+    doc.add_paragraph(SUMMARY_TEXT)
+
+    # Total Counts Section
+    doc.add_heading('Total Counts', level=1)
+    for label, key in COUNT_LABELS:
+        doc.add_paragraph(f"{label}: {counts[key]}")
+    for title, header, rows in summary_tables(counts):
+        doc.add_heading(title, level=2)
+        table = doc.add_table(rows=1, cols=2)
+        format_table_header(table, [header, "Count"])
+        add_table_rows(table, ((value, str(n)) for value, n in rows))
+        set_table_borders(table)
+
+    # Table of Contents
+    doc.add_heading('Table of Contents', level=1)
+    toc = doc.add_paragraph()
+    toc_run = toc.add_run()
+    for i, section in enumerate(sections):
+        toc_run.add_text(f"{i + 1}. {section['title']} ................... ")
+        toc_run.add_text(f"Page {i + 6}")  # Assuming the title page, summary, counts, and TOC take up 5 pages
+        toc_run.add_break()
+
+    doc.add_page_break()
+
+def add_resource_id(doc, item):
+    """Add a bold resource ID paragraph for a resource."""
+    resource_id = item.get('ID', 'N/A')
+    logger.debug("Resource ID: %s", resource_id)
+    id_paragraph = doc.add_paragraph()
+    id_run = id_paragraph.add_run(f"ID: {resource_id}")
+    id_run.bold = True
+
+def generate_document(sections, counts, filename='asbuilt.docx'):
+    """Generate a Word document with the given sections and counts."""
+    from docx import Document
+    doc = Document()
+    add_custom_styles(doc)
+    add_front_matter(doc, sections, counts)
+
+    # Content Sections
+    for section in sections:
+        doc.add_heading(section['title'], level=1)
+        doc.add_paragraph(section['description'])
+
+        headers, content = section_table(section)
+
+        # Create a table for each section with customized headers
+        table = doc.add_table(rows=1, cols=len(headers))
+        format_table_header(table, headers)
+
+        add_table_rows(table, (tuple(item.get(header, 'N/A') for header in headers) for item in content))
+
+        set_table_borders(table)
+
+        # Add resource IDs under the table
+        for item in section['content']:
+            add_resource_id(doc, item)
+
+        doc.add_paragraph("\n")  # Add a space between sections
+
+    doc.save(filename)
+    logger.info("Document saved as %s", filename)
+
+DOCUMENT_PART = 'word/document.xml'
+
+_XMLNS_DECLARATION = re.compile(rb' xmlns:(\w+)="([^"]*)"')
+
+_BODY_MARKER = 'asbuilt-body-marker'
+
+def _serialize_element(element, nsmap):
+    """Serialize a detached body element as python-docx would inside the document.
+
+    A detached element re-declares its namespaces, so declarations already made on
+    the w:document root are dropped from its start tag.
+    """
+    from lxml import etree
+    xml = etree.tostring(element, encoding='UTF-8')
+    end = xml.index(b'>')
+
+    def drop_inherited(match):
+        prefix, uri = match.group(1).decode(), match.group(2).decode()
+        return b'' if nsmap.get(prefix) == uri else match.group(0)
+
+    return _XMLNS_DECLARATION.sub(drop_inherited, xml[:end]) + xml[end:]
+
+def _flush_body(f, body, nsmap):
+    """Write out and remove every element in the document body except the final sectPr."""
+    for element in list(body)[:-1]:
+        f.write(_serialize_element(element, nsmap))
+        body.remove(element)
+
+def write_section_xml(f, doc, section):
+    """Write the body XML of one service section: heading, description, table and resource IDs.
+
+    Elements are created exactly as generate_document does, then written and
+    detached, so the tree never holds more than the table header or a single row.
+    """
+    body = doc.element.body
+    nsmap = doc.element.nsmap
+
+    doc.add_heading(section['title'], level=1)
+    doc.add_paragraph(section['description'])
+    _flush_body(f, body, nsmap)
+
+    headers, content = section_table(section)
+    table = doc.add_table(rows=1, cols=len(headers))
+    format_table_header(table, headers)
+    set_table_borders(table)
+    tbl = table._tbl
+    body.remove(tbl)
+
+    # Write the table start tag, properties and header row, then stream the rows
+    table_start = _serialize_element(tbl, nsmap)
+    closing_tag = b'</w:tbl>'
+    f.write(table_start[:-len(closing_tag)])
+    template = table_row_template(table)
+    for item in content:
+        tr = build_table_row(template, tuple(item.get(header, 'N/A') for header in headers))
+        f.write(_serialize_element(tr, nsmap))
+    f.write(closing_tag)
+
+    for item in section['content']:
+        add_resource_id(doc, item)
+        _flush_body(f, body, nsmap)
+
+    doc.add_paragraph("\n")  # Add a space between sections
+    _flush_body(f, body, nsmap)
+
+# Scratch document reused by render_section_xml within each worker process
+_section_document = None
+
+def render_section_xml(section):
+    """Return the body XML fragment of one section; run in a worker process."""
+    global _section_document
+    if _section_document is None:
+        from docx import Document
+        _section_document = Document()
+    f = io.BytesIO()
+    write_section_xml(f, _section_document, section)
+    return f.getvalue()
+
+def write_document_xml(f, doc, sections, workers=0):
+    """Write word/document.xml for the document, one body element at a time.
+
+    With more than one worker, section fragments are rendered in a process pool and
+    written in section order, giving the same bytes as the serial path.
+    """
+    from docx.oxml.ns import qn
+    from lxml import etree
+    root = doc.element
+    body = root.body
+    nsmap = root.nsmap
+
+    shell = etree.Element(root.tag, attrib=dict(root.attrib), nsmap=nsmap)
+    etree.SubElement(shell, qn('w:body')).text = _BODY_MARKER
+    head, tail = etree.tostring(shell, encoding='UTF-8', standalone=True).split(_BODY_MARKER.encode())
+    f.write(head)
+    _flush_body(f, body, nsmap)
+
+    if workers > 1 and len(sections) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=min(workers, len(sections))) as executor:
+            for fragment in executor.map(render_section_xml, sections):
+                f.write(fragment)
+    else:
+        for section in sections:
+            write_section_xml(f, doc, section)
+
+    # Page setup for the document, which python-docx keeps as the last body element
+    f.write(_serialize_element(body.sectPr, nsmap))
+    f.write(tail)
+
+def generate_document_streaming(sections, counts, filename='asbuilt.docx', workers=0):
+    """Generate the Word document, streaming word/document.xml into the package section by section."""
+    from docx import Document
+    doc = Document()
+    add_custom_styles(doc)
+    add_front_matter(doc, sections, counts)
+
+    # Save the package once to get every part except the body, which is streamed in its place
+    skeleton = io.BytesIO()
+    doc.save(skeleton)
+    with zipfile.ZipFile(skeleton) as src, zipfile.ZipFile(filename, 'w', zipfile.ZIP_DEFLATED) as dst:
+        for item in src.infolist():
+            if item.filename == DOCUMENT_PART:
+                with dst.open(DOCUMENT_PART, 'w') as f:
+                    write_document_xml(f, doc, sections, workers)
+            else:
+                dst.writestr(item, src.read(item.filename))
+    logger.info("Document saved as %s", filename)
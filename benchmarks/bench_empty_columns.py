@@ -0,0 +1,72 @@
+"""Benchmark the per-header remove_empty_columns scan against the column occupancy bitmap.
+
+Usage: python benchmarks/bench_empty_columns.py [rows]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from asbuilt.fake_resource_graph import FixtureResourceGraphClient
+from asbuilt.graph import enrich_resources
+from asbuilt.process import column_occupancy, occupied_headers
+from asbuilt.services import RESOURCE_TYPE_DETAILS
+from asbuilt.synthetic import SyntheticEstate
+
+# 12 columns: the record fields, the VM and storage account details, and two that these types never have
+HEADERS = ["Name", "Resource Group", "Location", "Kind", "SKU", "Tags", "ID",
+           "Size", "OS Type", "Access Tier", "State", "Database Edition"]
+
+# Mostly VMs, so the storage account columns are sparsely populated
+TYPE_WEIGHTS = {**{resource_type: 0 for resource_type in RESOURCE_TYPE_DETAILS},
+                "Microsoft.Compute/virtualMachines": 50, "Microsoft.Storage/storageAccounts": 1}
+
+def synthetic_rows(count):
+    """Return the enriched records of a synthetic estate of VMs and a few storage accounts, as one table."""
+    estate = SyntheticEstate(count, type_weights=TYPE_WEIGHTS)
+    resources = {}
+    for record in estate.records():
+        resources.setdefault(record.type, []).append(record)
+    enrich_resources({"client": FixtureResourceGraphClient(list(estate.graph_rows())), "subscription_ids": estate.subscription_ids},
+                     resources)
+    return [record for records in resources.values() for record in records]
+
+def per_header_scan(headers, content):
+    """The previous remove_empty_columns: one any() scan per header, then a rebuilt dict per row."""
+    non_empty_headers = []
+    non_empty_content = []
+    for header in headers:
+        if any(item.get(header, 'N/A') != 'N/A' for item in content):
+            non_empty_headers.append(header)
+    for item in content:
+        non_empty_content.append({k: v for k, v in item.items() if k in non_empty_headers})
+    return non_empty_headers, non_empty_content
+
+def bitmap_at_process(headers, content):
+    """The bitmap pipeline: occupancy is computed once at process time."""
+    return column_occupancy(headers, content)
+
+def bitmap_at_render(headers, occupied, content):
+    """Pruning at render time is a lookup of the precomputed bitmap."""
+    return occupied_headers(headers, occupied), content
+
+def timed(name, function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<20} {elapsed * 1000:9.2f} ms")
+    return result, elapsed
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    rows = synthetic_rows(count)
+    print(f"{count} rows x {len(HEADERS)} columns")
+    (before, _), old = timed("per-header scan", per_header_scan, HEADERS, rows)
+    occupied, build = timed("bitmap (process)", bitmap_at_process, HEADERS, rows)
+    (after, _), render = timed("bitmap (render)", bitmap_at_render, HEADERS, occupied, rows)
+    assert before == after, (before, after)
+    print(f"speedup              {old / (build + render):.1f}x overall")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Benchmark the ARM fetch against the local fake ARM server at several worker counts.
+
+Each run starts a fake ARM server (python -m asbuilt.fake_arm) in its own process, with
+per-page latency and optional 429/503 injection, and fetches its resources and VNets
+with load_azure_data, fetch_resources and fetch_network_details, as a --refresh run
+does. A fresh server per run means every run meets the same injected faults.
+
+Usage: python benchmarks/bench_fetch_concurrency.py [--workers 1,2,4,8] [--resources 20000] [--subscriptions 8]
+       [--page-size 200] [--latency 0.05] [--throttle-rate 0] [--unavailable-rate 0] [--retry-after 1]
+"""
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from asbuilt.collect import fetch_network_details, fetch_resources, load_azure_data
+from asbuilt.metrics import fetch_metrics
+from asbuilt.synthetic import SyntheticEstate
+
+def start_server(args):
+    """Start a fake ARM server process and return it with its base URL."""
+    server = subprocess.Popen([sys.executable, '-m', 'asbuilt.fake_arm', '--resources', str(args.resources),
+                               '--subscriptions', str(args.subscriptions), '--page-size', str(args.page_size),
+                               '--latency', str(args.latency), '--throttle-rate', str(args.throttle_rate),
+                               '--unavailable-rate', str(args.unavailable_rate), '--retry-after', str(args.retry_after)],
+                              cwd=os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'),
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    return server, server.stdout.readline().strip()
+
+def run(args, subscription_ids, workers):
+    server, url = start_server(args)
+    try:
+        fetch_metrics().clear()
+        resource_clients, network_clients = load_azure_data(subscription_ids, base_url=url)
+        start = time.perf_counter()
+        resources = fetch_resources(resource_clients, max_workers=workers)
+        fetch_network_details(network_clients, max_workers=workers)
+        wall = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait()
+    items = sum(len(records) for records in resources.values())
+    totals = fetch_metrics().report()['totals']
+    print(f"{workers:>7} {wall:8.2f}s {items / wall:10,.0f}/s {totals['requests']:9} {totals['retries']:8} "
+          f"{totals['throttle_wait_seconds']:9.2f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ARM fetch against the fake ARM server at several worker counts.")
+    parser.add_argument('--workers', default='1,2,4,8', help="Comma-separated worker counts.")
+    parser.add_argument('--resources', type=int, default=20000)
+    parser.add_argument('--subscriptions', type=int, default=8)
+    parser.add_argument('--page-size', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.05, help="Seconds the server waits before each page.")
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--unavailable-rate', type=float, default=0.0)
+    parser.add_argument('--retry-after', type=float, default=1.0)
+    args = parser.parse_args()
+
+    # The server's synthetic estate has the same subscription IDs for the same seed
+    subscription_ids = SyntheticEstate(0, args.subscriptions).subscription_ids
+    print(f"{args.resources:,} resources in {args.subscriptions} subscriptions, pages of {args.page_size}, "
+          f"{args.latency * 1000:g} ms per page, {args.throttle_rate:.0%} throttled, {args.unavailable_rate:.0%} unavailable")
+    print(f"{'workers':>7} {'wall':>9} {'resources':>12} {'requests':>9} {'retries':>8} {'waited':>10}")
+    for workers in (int(workers) for workers in args.workers.split(',')):
+        run(args, subscription_ids, workers)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Benchmark the logging cost seen by the pipeline: the old DEBUG basicConfig against configure_logging.
+
+The old setup wrote every record, including one "Resource ID" line per resource,
+to the file and the console from the calling thread, formatting it eagerly with
+an f-string. configure_logging queues records for a listener thread, and the
+per-resource line is a lazily formatted DEBUG record that is dropped at INFO.
+Console output goes to /dev/null so the terminal does not dominate the timing.
+
+Usage: python benchmarks/bench_logging.py [records]
+"""
+import os
+import sys
+import time
+import logging
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from asbuilt.logs import configure_logging, stop_logging
+
+def old_config(log_file):
+    logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s', force=True,
+                        handlers=[logging.FileHandler(log_file, mode='w'), logging.StreamHandler()])
+
+def new_config(log_file):
+    configure_logging(log_file=log_file)
+
+def log_resources_eager(count):
+    for i in range(count):
+        resource_id = f"/subscriptions/sub/resourceGroups/rg/providers/Microsoft.Compute/disks/disk{i}"
+        logging.info(f"Resource ID: {resource_id}")
+
+def log_resources_lazy(count):
+    logger = logging.getLogger('asbuilt.word')
+    for i in range(count):
+        resource_id = f"/subscriptions/sub/resourceGroups/rg/providers/Microsoft.Compute/disks/disk{i}"
+        logger.debug("Resource ID: %s", resource_id)
+
+def log_progress_lazy(count):
+    logger = logging.getLogger('asbuilt.collect')
+    for i in range(count):
+        logger.info("Fetched page %s of subscription %s.", i, 'sub')
+
+def measure(name, setup, body, count):
+    with tempfile.TemporaryDirectory() as directory:
+        setup(os.path.join(directory, 'asbuiltlogs.txt'))
+        start = time.perf_counter()
+        body(count)
+        elapsed = time.perf_counter() - start
+        stop_logging()
+        logging.getLogger().handlers.clear()
+    print(f"{name:<34} {elapsed:6.2f}s {elapsed / count * 1e6:8.2f} us/record on the calling thread")
+    return elapsed
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    sys.stderr = open(os.devnull, 'w')
+    old = measure("basicConfig DEBUG, eager f-string", old_config, log_resources_eager, count)
+    new = measure("configure_logging, DEBUG dropped", new_config, log_resources_lazy, count)
+    queued = measure("configure_logging, INFO queued", new_config, log_progress_lazy, count)
+    print(f"per-resource line: {old / new:.0f}x less; records that are kept: {old / queued:.1f}x less on the calling thread")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Benchmark the time and peak memory of every pipeline stage on synthetic estates, and keep the results.
+
+Each estate size runs in its own process, so the peaks do not mix. The stages are:
+
+- collect: fetch the network details and resources from a fake ARM server in a child process, as a run does: every
+  subscription in parallel, records spooled by type, with the VNet address spaces set as batches spill
+- process: process_resource_data, which counts, builds the sections and finds the empty columns
+- snapshot: write a gzip-compressed snapshot
+- load snapshot: read it back into spools, as a rerun within the TTL does
+- render FORMAT: each output format, docx streamed as the command does by default
+
+Every run is appended to benchmarks/results/pipeline.jsonl, with the commit and the
+machine. Each size is compared with the previous run of the same size, seed and formats.
+
+Usage: python benchmarks/bench_pipeline.py [--sizes 1000,10000,100000,1000000] [--formats md,docx] [--label TEXT]
+"""
+import os
+import sys
+import gzip
+import json
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+from functools import partial
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from asbuilt.cli import prepare_records
+from asbuilt.collect import fetch_network_details, fetch_resources, load_azure_data
+from asbuilt.fake_arm import FakeArmProcess
+from asbuilt.metrics import StageMetrics
+from asbuilt.process import process_resource_data, vnet_address_prefixes
+from asbuilt.render import render_outputs
+from asbuilt.snapshot import SNAPSHOT_VERSION, load_snapshot, write_snapshot_json
+from asbuilt.spool import SPOOL_BUFFER, Spooler
+from asbuilt.synthetic import SyntheticEstate
+
+RESULTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results', 'pipeline.jsonl')
+PAGE_SIZE = 1000  # Resources per page, as resources.list() returns them
+
+def run(args):
+    """Run the pipeline once in this process and print its stages as JSON."""
+    estate = SyntheticEstate(args.resources, args.subscriptions, seed=args.seed)
+    metrics = StageMetrics()
+    server = FakeArmProcess('--resources', args.resources, '--subscriptions', args.subscriptions, '--seed', args.seed,
+                            '--page-size', PAGE_SIZE)
+    with server as url, Spooler() as spooler, tempfile.TemporaryDirectory() as output:
+        with metrics.stage('collect'):
+            resource_clients, network_clients = load_azure_data(estate.subscription_ids, base_url=url)
+            network_details = fetch_network_details(network_clients)
+            spooler.prepare = partial(prepare_records, None, vnet_address_prefixes(network_details))
+            resources = fetch_resources(resource_clients, spooler=spooler)
+            spooler.seal(resources)
+        with metrics.stage('process'):
+            sections, counts = process_resource_data(resources, network_details)
+        snapshot_path = os.path.join(output, 'snapshot.json.gz')
+        with metrics.stage('snapshot'):
+            with gzip.open(snapshot_path, 'wt', encoding='utf-8') as f:
+                write_snapshot_json(f, {"version": SNAPSHOT_VERSION, "created": None}, resources, network_details)
+        with metrics.stage('load snapshot'), Spooler() as snapshot_spooler:
+            load_snapshot(snapshot_path, snapshot_spooler)
+        render_outputs(sections, counts, args.formats.split(','), os.path.join(output, 'asbuilt'), stream_docx=True, metrics=metrics)
+    print(json.dumps(metrics.stages))
+
+def git_commit():
+    """Return the short commit of the tree and whether it has uncommitted changes, or (None, None) outside git."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT, capture_output=True, text=True,
+                                check=True).stdout
+        return commit, bool(status.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+def previous_result(path, result):
+    """Return the last stored result with the same size, subscriptions, seed and formats, or None."""
+    if not os.path.exists(path):
+        return None
+    key = ('resources', 'subscriptions', 'seed', 'formats')
+    previous = None
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            entry = json.loads(line)
+            if all(entry.get(k) == result[k] for k in key):
+                previous = entry
+    return previous
+
+def _change(new, old):
+    return f"{(new - old) / old * 100:+6.1f}%" if old else ''
+
+def print_result(result, previous):
+    print(f"\n{result['resources']:,} resources in {result['subscriptions']} subscriptions"
+          + (f", compared with {previous['commit']} at {previous['time'][:16]}" if previous else ''))
+    old_stages = {stage['name']: stage for stage in previous['stages']} if previous else {}
+    for stage in result['stages']:
+        old = old_stages.get(stage['name'])
+        wall, peak = stage['wall_seconds'], (stage['peak_rss_bytes'] or 0) / 2 ** 20
+        line = f"  {stage['name']:<14} {wall:8.2f}s {peak:8.1f} MiB"
+        if old:
+            line += f"   {_change(wall, old['wall_seconds'])} {_change(peak, (old['peak_rss_bytes'] or 0) / 2 ** 20)}"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every pipeline stage on synthetic estates.")
+    parser.add_argument('--sizes', default='1000,10000,100000,1000000', help="Comma-separated estate sizes in resources.")
+    parser.add_argument('--subscriptions', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--formats', default='md,docx', help="Comma-separated output formats to render.")
+    parser.add_argument('--results', default=RESULTS, metavar='FILE', help="JSON lines file the results are appended to.")
+    parser.add_argument('--label', default='', help="Note stored with the results, such as the change being measured.")
+    parser.add_argument('--resources', type=int, help=argparse.SUPPRESS)  # Set for the child process of one size
+    args = parser.parse_args()
+    if args.resources is not None:
+        run(args)
+        return
+
+    commit, dirty = git_commit()
+    os.makedirs(os.path.dirname(os.path.abspath(args.results)), exist_ok=True)
+    for size in (int(size) for size in args.sizes.split(',')):
+        child = subprocess.run([sys.executable, os.path.abspath(__file__), '--resources', str(size),
+                                '--subscriptions', str(args.subscriptions), '--seed', str(args.seed), '--formats', args.formats],
+                               check=True, capture_output=True, text=True)
+        result = {
+            "time": datetime.now(timezone.utc).isoformat(),
+            "commit": commit,
+            "dirty": dirty,
+            "label": args.label,
+            "python": platform.python_version(),
+            "machine": f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPUs",
+            "resources": size,
+            "subscriptions": args.subscriptions,
+            "seed": args.seed,
+            "formats": args.formats,
+            "spool_buffer": SPOOL_BUFFER,
+            "stages": json.loads(child.stdout.splitlines()[-1]),
+        }
+        print_result(result, previous_result(args.results, result))
+        with open(args.results, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(result) + '\n')
+    print(f"\nResults appended to {args.results}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Benchmark the peak memory of each pipeline stage with resource lists against spooled records.
+
+Each mode runs in its own process so the peaks do not mix. The estate is served
+by a fake ARM server in a child process, and fetched by fetch_resources as a run
+does, with every subscription in parallel; the records are then processed into
+sections and rendered as Markdown and as a streamed docx. With spools, the most
+records the spools held in memory at once is printed too, sampled as batches spill.
+
+Usage: python benchmarks/bench_streaming_memory.py [resources] [spool buffer] [subscriptions]
+"""
+import os
+import sys
+import time
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from asbuilt.collect import fetch_resources, load_azure_data
+from asbuilt.fake_arm import FakeArmProcess
+from asbuilt.metrics import StageMetrics
+from asbuilt.process import process_resource_data
+from asbuilt.render import render_outputs
+from asbuilt.spool import Spooler
+from asbuilt.synthetic import SyntheticEstate
+
+PAGE_SIZE = 1000
+
+class CountingSpooler(Spooler):
+    """A Spooler that samples how many records its spools hold in memory each time a batch spills."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.spools = []
+        self.peak_records = 0
+
+    def __call__(self, resource_type):
+        spool = super().__call__(resource_type)
+        self.spools.append(spool)
+        return spool
+
+    def spill(self, records):
+        held = len(records) + sum(len(spool.buffer) for spool in list(self.spools))
+        self.peak_records = max(self.peak_records, held)
+        return super().spill(records)
+
+def run(mode, count, limit, subscriptions):
+    """Run the pipeline once in this process and print the peak memory of each stage."""
+    estate = SyntheticEstate(count, subscriptions)
+    metrics = StageMetrics()
+    start = time.perf_counter()
+    server = FakeArmProcess('--resources', count, '--subscriptions', subscriptions, '--page-size', PAGE_SIZE)
+    with server as url, CountingSpooler(limit=limit) as spooler, tempfile.TemporaryDirectory() as output:
+        with metrics.stage('collect'):
+            resource_clients, _ = load_azure_data(estate.subscription_ids, base_url=url)
+            resources = fetch_resources(resource_clients, spooler=spooler if mode == 'spool' else None)
+            spooler.seal(resources)
+        with metrics.stage('process'):
+            sections, counts = process_resource_data(resources, {})
+        render_outputs(sections, counts, ['md', 'docx'], os.path.join(output, 'asbuilt'), stream_docx=True, metrics=metrics)
+    stages = '  '.join(f"{stage['name']} {stage['peak_rss_bytes'] / 2 ** 20:7.1f}" for stage in metrics.stages)
+    held = max(spooler.peak_records, sum(len(spool.buffer) for spool in spooler.spools)) if mode == 'spool' else count
+    print(f"{mode:<6} {time.perf_counter() - start:6.1f}s  peak MiB: {stages}  records held: {held:,}")
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] in ('list', 'spool'):
+        run(sys.argv[1], *map(int, sys.argv[2:5]))
+        return
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    subscriptions = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    print(f"{count:,} resources in {subscriptions} subscriptions, spool buffer {limit:,} records per type")
+    for mode in ('list', 'spool'):
+        subprocess.run([sys.executable, os.path.abspath(__file__), mode, str(count), str(limit), str(subscriptions)], check=True,
+                       stderr=subprocess.DEVNULL)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import os
+from asbuilt.collect import fetch_network_details, fetch_resources, load_azure_data, pages_with_resume
+from asbuilt.fake_arm import FakeArmServer
+from asbuilt.metrics import fetch_metrics
+from asbuilt.spool import Spooler
+from asbuilt.synthetic import SyntheticEstate
+
+class CountingSpooler(Spooler):
+    """A Spooler that samples how many records its spools hold in memory each time a batch spills."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.spools = []
+        self.peak_records = 0
+
+    def __call__(self, resource_type):
+        spool = super().__call__(resource_type)
+        self.spools.append(spool)
+        return spool
+
+    def spill(self, records):
+        self.peak_records = max(self.peak_records, len(records) + sum(len(spool.buffer) for spool in list(self.spools)))
+        return super().spill(records)
+
+def test_parallel_fetches_share_one_spool_per_type(tmp_path):
+    estate = SyntheticEstate(2400, 8)
+    with FakeArmServer(estate, page_size=50) as server, CountingSpooler(limit=20, directory=str(tmp_path)) as spooler:
+        resource_clients, _ = load_azure_data(estate.subscription_ids, base_url=server.url)
+        resources = fetch_resources(resource_clients, max_workers=8, spooler=spooler)
+        spooler.seal(resources)
+
+        assert len(spooler.spools) == len(resources)
+        assert spooler.peak_records <= len(resources) * spooler.limit
+        assert sorted(record.id for records in resources.values() for record in records) == \
+            sorted(resource['id'] for resource in estate.resources())
+
+def fetch_inventory(server, estate):
+    """Fetch the estate from a fake ARM server; return its records, network details and fetch counters."""
+    fetch_metrics().clear()
+    resource_clients, network_clients = load_azure_data(estate.subscription_ids, base_url=server.url)
+    resources = fetch_resources(resource_clients)
+    records = sorted((record.to_dict() for records in resources.values() for record in records), key=lambda record: record['id'])
+    return records, fetch_network_details(network_clients), fetch_metrics().report()["totals"]
+
+def test_throttled_fetch_retries_and_matches_an_unthrottled_one():
+    estate = SyntheticEstate(400, 2)
+    with FakeArmServer(estate, page_size=40) as server:
+        records, network_details, _ = fetch_inventory(server, estate)
+    with FakeArmServer(estate, page_size=40, throttle_rate=0.3, retry_after=0.01) as server:
+        throttled_records, throttled_network_details, totals = fetch_inventory(server, estate)
+
+    assert server.stats["throttled"] > 0
+    assert totals["retries"] == totals["throttled"] == server.stats["throttled"]
+    assert (throttled_records, throttled_network_details) == (records, network_details)
+
+def test_throttled_listing_resumes_from_the_failed_page():
+    from azure.mgmt.resource import ResourceManagementClient
+    from asbuilt.session import management_client_options
+    estate = SyntheticEstate(300, 1)
+    sub_id = estate.subscription_ids[0]
+    with FakeArmServer(estate, page_size=20, throttle_rate=0.3, retry_after=0.01) as server:
+        credential, endpoint = management_client_options(server.url)
+        # Without the SDK's retries, every 429 reaches pages_with_resume
+        client = ResourceManagementClient(credential, sub_id, retry_total=0, **endpoint)
+        fetch_metrics().clear()
+        pages = list(pages_with_resume(client.resources.list, "Resource listing", subscription_id=sub_id))
+
+    assert [resource.id for items, _ in pages for resource in items] == [resource['id'] for resource in estate.resources()]
+    assert [token is None for _, token in pages] == [False] * (len(pages) - 1) + [True]
+    assert server.stats["resources pages"] == len(pages) == 15
+    assert fetch_metrics().report()["totals"]["retries"] == server.stats["throttled"] > 0
+
+class InterruptedServer(FakeArmServer):
+    """Answers one subscription's third page of resources with a 404 until interrupted is cleared."""
+
+    interrupted = True
+
+    def fault(self, url):
+        if self.interrupted and f"/subscriptions/{self.estate.subscription_ids[1]}/resources" in url and "skiptoken=80" in url:
+            return 404
+        return super().fault(url)
+
+def test_resume_fetches_only_what_an_interrupted_run_missed(tmp_path):
+    from asbuilt.cli import inventory_source, load_inventory, parse_args
+    from asbuilt.collect import checkpoint_path
+    from asbuilt.snapshot import find_latest_snapshot
+    estate = SyntheticEstate(600, 3)
+    with InterruptedServer(estate, page_size=40) as server, Spooler(limit=30, directory=str(tmp_path)) as spooler:
+        options = ['--arm-base-url', server.url, '--snapshot-dir', str(tmp_path / 'snapshots'), '--no-enrich', '--log-file', '']
+        args = parse_args(options)
+        checkpoint = checkpoint_path(estate.subscription_ids, args.snapshot_dir, inventory_source(args))
+        load_inventory(args, estate.subscription_ids, spooler)
+        assert os.path.exists(checkpoint)
+        assert find_latest_snapshot(estate.subscription_ids, args.snapshot_dir, inventory_source(args)) is None
+
+        server.interrupted = False
+        pages_before = server.stats["resources pages"]
+        resources, _ = load_inventory(parse_args(options + ['--resume']), estate.subscription_ids, spooler)
+        missed_pages = -(-estate.subscription_resource_count(1) // 40) - 2
+
+        assert server.stats["resources pages"] - pages_before == missed_pages
+        assert sorted(record.id for records in resources.values() for record in records) == \
+            sorted(resource['id'] for resource in estate.resources())
+    assert not os.path.exists(checkpoint)
+    assert find_latest_snapshot(estate.subscription_ids, args.snapshot_dir, inventory_source(args)) is not None
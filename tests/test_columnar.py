@@ -0,0 +1,45 @@
+import pytest
+from asbuilt.process import COUNT_LABELS, process_resource_data
+from asbuilt.records import ResourceRecord
+from asbuilt.synthetic import SyntheticEstate
+
+pytest.importorskip('pyarrow')
+
+from asbuilt.columnar import process_inventory_table, read_inventory_dataset, resources_to_table, write_inventory_dataset
+
+def sections_and_counts(sections, counts):
+    return ([(section["title"], section["headers"], section["columns"], [sorted(record.items()) for record in section["content"]])
+             for section in sections],
+            {key: counts[key] for _, key in COUNT_LABELS})
+
+def test_dataset_renders_in_the_order_of_the_run_that_wrote_it(tmp_path):
+    estate = SyntheticEstate(800, 4)
+    resources = {}
+    for subscription in range(estate.subscriptions):
+        for resource in estate.subscription_resources(subscription, 0, None):
+            record = ResourceRecord.from_dict(resource)
+            resources.setdefault(record.type, []).append(record)
+    network_details = estate.network_details()
+
+    live = sections_and_counts(*process_resource_data(resources, network_details))
+    table = resources_to_table(resources, network_details)
+    write_inventory_dataset(table, str(tmp_path))
+
+    assert sections_and_counts(*process_inventory_table(table)) == live
+    assert sections_and_counts(*process_inventory_table(read_inventory_dataset(str(tmp_path)))) == live
+
+def test_table_with_interleaved_types_gives_the_same_sections():
+    estate = SyntheticEstate(800, 4)
+    resources = {}
+    for record in estate.records():
+        resources.setdefault(record.type, []).append(record)
+    table = resources_to_table(resources, estate.network_details())
+    interleaved = table.sort_by('id')
+
+    def by_title(sections):
+        return {section["title"]: (section["columns"], sorted(record.id for record in section["content"])) for section in sections}
+
+    sections, counts = process_inventory_table(table)
+    interleaved_sections, interleaved_counts = process_inventory_table(interleaved)
+    assert by_title(interleaved_sections) == by_title(sections)
+    assert interleaved_counts == counts
@@ -0,0 +1,66 @@
+from asbuilt.collect import fetch_network_details, fetch_resources, load_azure_data
+from asbuilt.fake_arm import FakeArmServer
+from asbuilt.fake_resource_graph import FixtureResourceGraphClient
+from asbuilt.graph import fetch_network_details_graph, fetch_resources_graph
+from asbuilt.process import COUNT_LABELS, process_resource_data
+from asbuilt.synthetic import SyntheticEstate
+
+def graph_info(rows, changes=None):
+    return {"client": FixtureResourceGraphClient(rows, changes=changes), "subscription_ids": None}
+
+def report(resources, network_details):
+    sections, counts = process_resource_data(resources, network_details)
+    return {key: counts[key] for _, key in COUNT_LABELS}, counts["dimensions"]["type"], sorted(section["title"] for section in sections)
+
+def test_backends_report_the_same_estate_alike():
+    estate = SyntheticEstate(600, 3)
+    info = graph_info(list(estate.graph_rows()))
+    info["subscription_ids"] = estate.subscription_ids
+    graph = report(fetch_resources_graph(info), fetch_network_details_graph(info))
+
+    with FakeArmServer(estate, page_size=100) as server:
+        resource_clients, network_clients = load_azure_data(estate.subscription_ids, base_url=server.url)
+        arm = report(fetch_resources(resource_clients), fetch_network_details(network_clients))
+
+    assert graph[0]["disks"] > 0
+    assert graph == arm
+
+def test_incremental_changes_replace_records_of_an_arm_inventory():
+    from asbuilt.graph import fetch_incremental_inventory
+    from asbuilt.records import ResourceRecord
+    prefix = "/subscriptions/sub-a/resourceGroups/rg/providers"
+    arm_resources = [
+        {"id": f"{prefix}/Microsoft.Compute/disks/d1", "name": "d1", "type": "Microsoft.Compute/disks", "location": "eastus"},
+        {"id": f"{prefix}/Microsoft.Compute/disks/d2", "name": "d2", "type": "Microsoft.Compute/disks", "location": "eastus"},
+        {"id": f"{prefix}/Contoso.Widgets/gadgets/g1", "name": "g1", "type": "Contoso.Widgets/gadgets", "location": "eastus"},
+        {"id": f"{prefix}/Contoso.Widgets/gadgets/g2", "name": "g2", "type": "Contoso.Widgets/gadgets", "location": "eastus"},
+    ]
+    resources = {}
+    for resource in arm_resources:
+        resources.setdefault(resource["type"], []).append(ResourceRecord.from_dict(resource))
+    rows = [{**resource, "type": resource["type"].lower(), "location": "eastus2"} for resource in arm_resources
+            if resource["name"] in ("d1", "g1")]
+    changes = [
+        {"targetResourceId": f"{prefix}/Microsoft.Compute/disks/d1", "changeType": "Update", "changeTime": "2026-01-02T00:00:00+00:00"},
+        {"targetResourceId": f"{prefix}/Contoso.Widgets/gadgets/g1", "changeType": "Update", "changeTime": "2026-01-02T00:00:00+00:00"},
+        {"targetResourceId": f"{prefix}/Microsoft.Compute/disks/d2", "changeType": "Delete", "changeTime": "2026-01-02T00:00:00+00:00"},
+        {"targetResourceId": f"{prefix}/Contoso.Widgets/gadgets/g2", "changeType": "Delete", "changeTime": "2026-01-02T00:00:00+00:00"},
+    ]
+    info = graph_info(rows, changes)
+    info["subscription_ids"] = ["sub-a"]
+
+    resources, _ = fetch_incremental_inventory(info, resources, {}, "2026-01-01T00:00:00+00:00", enrich=False)
+
+    assert sorted(resources) == ["Contoso.Widgets/gadgets", "Microsoft.Compute/disks"]
+    assert [(r.name, r.location) for r in resources["Microsoft.Compute/disks"]] == [("d1", "eastus2")]
+    assert [(r.name, r.location) for r in resources["Contoso.Widgets/gadgets"]] == [("g1", "eastus2")]
+
+def test_only_resource_graph_itself_is_rate_limited(tmp_path):
+    from asbuilt.graph import load_resource_graph_data
+    from asbuilt.synthetic import write_graph_fixture
+    estate = SyntheticEstate(10, 1)
+    fixture = tmp_path / "estate.json"
+    write_graph_fixture(estate, fixture)
+
+    assert load_resource_graph_data(estate.subscription_ids, fixture=str(fixture))["limiter"] is None
+    assert load_resource_graph_data(estate.subscription_ids, base_url="http://127.0.0.1:8080")["limiter"] is None
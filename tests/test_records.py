@@ -0,0 +1,39 @@
+import pickle
+from asbuilt.records import ResourceRecord, TagSet
+
+class CollidingValue:
+    """A tag value whose hash collides with every other one."""
+
+    def __init__(self, value):
+        self.value = value
+
+    def __hash__(self):
+        return 1
+
+    def __eq__(self, other):
+        return isinstance(other, CollidingValue) and other.value == self.value
+
+def test_equal_tag_sets_are_shared_and_colliding_ones_are_not():
+    first = ResourceRecord('/subscriptions/s/resourceGroups/rg/providers/T/a', 'a', 'T', tags={'env': 'prod', 'team': 'x'})
+    second = ResourceRecord('/subscriptions/s/resourceGroups/rg/providers/T/b', 'b', 'T', tags={'env': 'prod', 'team': 'x'})
+    assert first.tags is second.tags
+    assert isinstance(first.tags, TagSet) and first.tags.names == ('env', 'team')
+
+    one = ResourceRecord('/subscriptions/s/resourceGroups/rg/providers/T/c', 'c', 'T', tags={'k': CollidingValue(1)})
+    two = ResourceRecord('/subscriptions/s/resourceGroups/rg/providers/T/d', 'd', 'T', tags={'k': CollidingValue(2)})
+    assert one.tags['k'].value == 1 and two.tags['k'].value == 2
+
+def test_ids_are_kept_only_when_they_cannot_be_rebuilt():
+    plain = ResourceRecord('/subscriptions/sub/resourceGroups/RG-1/providers/Microsoft.Compute/disks/disk-1',
+                           'disk-1', 'Microsoft.Compute/disks')
+    child = ResourceRecord('/subscriptions/SUB/resourceGroups/rg/providers/Microsoft.Sql/servers/s/databases/d',
+                           's/d', 'Microsoft.Sql/servers/databases')
+    missing = ResourceRecord(None, 'x', 'T')
+    assert plain._id is False
+    assert plain.id == '/subscriptions/sub/resourceGroups/RG-1/providers/Microsoft.Compute/disks/disk-1'
+    assert child.id == '/subscriptions/SUB/resourceGroups/rg/providers/Microsoft.Sql/servers/s/databases/d'
+    assert child.subscription_id == 'sub'
+    assert missing.id is None
+    for record in (plain, child, missing):
+        assert ResourceRecord.from_dict(record.to_dict()).to_dict() == record.to_dict()
+        assert pickle.loads(pickle.dumps(record)).id == record.id
@@ -0,0 +1,41 @@
+import pytest
+from asbuilt.process import process_resource_data
+from asbuilt.records import ResourceRecord
+from asbuilt.render import render_outputs
+from asbuilt.synthetic import SyntheticEstate
+
+@pytest.mark.parametrize('stream_docx', [False, True])
+def test_docx_tags_read_as_in_the_text_formats(tmp_path, stream_docx):
+    import docx
+    record = ResourceRecord("/subscriptions/sub-a/resourceGroups/rg/providers/Microsoft.Storage/storageAccounts/sa0", "sa0",
+                            "Microsoft.Storage/storageAccounts", location="eastus", tags={"owner": "team1", "costCenter": "cc-7"})
+    sections, counts = process_resource_data({record.type: [record]}, {})
+    paths = render_outputs(sections, counts, ['docx', 'md'], str(tmp_path / 'asbuilt'), stream_docx=stream_docx)
+
+    with open(paths['md'], encoding='utf-8') as f:
+        md_tags = [line.rstrip(' |\n').rsplit(' | ', 1)[-1] for line in f if line.startswith('| sa0 ')]
+    tables = [table for table in docx.Document(paths['docx']).tables if table.rows[0].cells[-1].text == 'Tags']
+    docx_tags = [row.cells[-1].text for table in tables for row in table.rows[1:]]
+
+    assert docx_tags == md_tags == ["owner: team1, costCenter: cc-7"]
+
+def test_docx_is_identical_however_it_is_rendered(tmp_path):
+    import zipfile
+    resources = {}
+    for record in SyntheticEstate(600, 3).records():
+        resources.setdefault(record.type, []).append(record)
+    sections, counts = process_resource_data(resources, {})
+    documents = []
+    for name, stream_docx, render_workers in (('document', False, 0), ('streamed', True, 0), ('workers', True, 3)):
+        paths = render_outputs(sections, counts, ['docx'], str(tmp_path / name), stream_docx=stream_docx, render_workers=render_workers)
+        with zipfile.ZipFile(paths['docx']) as package:
+            documents.append(package.read('word/document.xml'))
+
+    assert documents[0] == documents[1] == documents[2]
+
+def test_negative_render_workers_are_rejected(capsys):
+    from asbuilt.cli import parse_args
+    assert parse_args(['--render-workers', '2']).render_workers == 2
+    with pytest.raises(SystemExit):
+        parse_args(['--render-workers', '-3'])
+    assert "worker count must be 0 or more" in capsys.readouterr().err
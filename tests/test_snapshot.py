@@ -0,0 +1,78 @@
+import gzip
+import json
+import pytest
+from asbuilt.cli import inventory_source, load_inventory, parse_args
+from asbuilt.process import set_address_spaces, vnet_address_prefixes
+from asbuilt.snapshot import find_latest_snapshot, load_snapshot, save_snapshot
+from asbuilt.spool import RecordSpool, Spooler
+from asbuilt.synthetic import SyntheticEstate, write_graph_fixture
+
+def test_snapshot_of_another_version_is_a_cache_miss(tmp_path):
+    estate = SyntheticEstate(50, 1)
+    fixture = tmp_path / "estate.json"
+    write_graph_fixture(estate, fixture)
+    args = parse_args(['--graph-fixture', str(fixture), '--snapshot-dir', str(tmp_path), '--no-enrich', '--log-file', ''])
+    stale = save_snapshot(estate.subscription_ids, {}, {}, tmp_path, source=inventory_source(args))
+    with gzip.open(stale, 'rt', encoding='utf-8') as f:
+        header, *lines = f.readlines()
+    with gzip.open(stale, 'wt', encoding='utf-8') as f:
+        f.writelines([json.dumps({**json.loads(header), "version": 2}) + '\n', *lines])
+
+    resources, _ = load_inventory(args, estate.subscription_ids)
+
+    assert sum(len(records) for records in resources.values()) == 50
+    assert find_latest_snapshot(estate.subscription_ids, tmp_path, inventory_source(args)) != stale
+
+def test_failed_resource_graph_fetch_saves_no_snapshot(tmp_path, monkeypatch):
+    from asbuilt.fake_resource_graph import FixtureResourceGraphClient
+    estate = SyntheticEstate(3000, 2)
+    fixture = tmp_path / "estate.json"
+    write_graph_fixture(estate, fixture)
+    answer = FixtureResourceGraphClient.resources
+
+    def fail_after_first_page(self, query):
+        if len(self.requests) > 1:
+            raise ConnectionError("connection reset")
+        return answer(self, query)
+
+    monkeypatch.setattr(FixtureResourceGraphClient, 'resources', fail_after_first_page)
+    args = parse_args(['--graph-fixture', str(fixture), '--snapshot-dir', str(tmp_path), '--no-enrich', '--log-file', ''])
+    with pytest.raises(SystemExit):
+        load_inventory(args, estate.subscription_ids)
+
+    assert find_latest_snapshot(estate.subscription_ids, tmp_path, inventory_source(args)) is None
+
+def test_snapshots_are_reused_by_runs_of_the_same_source_only(tmp_path):
+    estate = SyntheticEstate(50, 1)
+    fixture = tmp_path / "estate.json"
+    write_graph_fixture(estate, fixture)
+    options = ['--snapshot-dir', str(tmp_path), '--log-file', '']
+    unenriched = parse_args(['--graph-fixture', str(fixture), '--no-enrich'] + options)
+    enriched = parse_args(['--graph-fixture', str(fixture)] + options)
+    fake_arm = parse_args(['--arm-base-url', 'http://127.0.0.1:8080', '--no-enrich'] + options)
+
+    load_inventory(unenriched, estate.subscription_ids)
+    saved = find_latest_snapshot(estate.subscription_ids, tmp_path, inventory_source(unenriched))
+    load_inventory(unenriched, estate.subscription_ids)
+
+    assert saved is not None
+    assert find_latest_snapshot(estate.subscription_ids, tmp_path, inventory_source(unenriched)) == saved
+    assert find_latest_snapshot(estate.subscription_ids, tmp_path) is None
+    assert find_latest_snapshot(estate.subscription_ids, tmp_path, inventory_source(enriched)) is None
+    assert len({inventory_source(args) for args in (unenriched, enriched, fake_arm)} - {None}) == 3
+
+def test_snapshot_reads_back_into_spools(tmp_path):
+    estate = SyntheticEstate(500, 2)
+    resources = {}
+    for record in estate.records():
+        resources.setdefault(record.type, []).append(record)
+    set_address_spaces(resources["Microsoft.Network/virtualNetworks"], vnet_address_prefixes(estate.network_details()))
+    path = save_snapshot(estate.subscription_ids, resources, estate.network_details(), tmp_path)
+
+    with Spooler(limit=10, directory=str(tmp_path)) as spooler:
+        loaded, network_details, _ = load_snapshot(path, spooler)
+        assert all(isinstance(records, RecordSpool) for records in loaded.values())
+        assert spooler.spilled > 0
+        assert {resource_type: [record.to_dict() for record in records] for resource_type, records in loaded.items()} == \
+            {resource_type: [record.to_dict() for record in records] for resource_type, records in resources.items()}
+    assert network_details == json.loads(json.dumps(estate.network_details()))
@@ -0,0 +1,30 @@
+import os
+import re
+import sys
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Loaded only by the functions that fetch from Azure or render the formats that need them
+HEAVY_MODULES = ('azure', 'docx', 'lxml', 'requests', 'urllib3', 'msal', 'openpyxl', 'pyarrow', 'multiprocessing')
+
+IMPORT_CAP_MS = 300
+
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+def importtime(args, cwd):
+    """Run Python with -X importtime and return {module: cumulative microseconds}."""
+    result = subprocess.run([sys.executable, '-X', 'importtime'] + args, cwd=cwd, capture_output=True, text=True, check=True)
+    return {match.group(4): int(match.group(2)) for match in map(IMPORT_LINE.match, result.stderr.splitlines()) if match}
+
+def heavy(modules):
+    return sorted(name for name in modules if name.split('.')[0] in HEAVY_MODULES)
+
+def test_cli_imports_no_heavy_dependency(tmp_path):
+    modules = importtime(['-c', f"import sys; sys.path.insert(0, {ROOT!r}); import asbuilt.cli"], tmp_path)
+
+    assert heavy(modules) == []
+    assert modules['asbuilt.cli'] / 1000 < IMPORT_CAP_MS
+
+def test_help_imports_no_heavy_dependency(tmp_path):
+    assert heavy(importtime([os.path.join(ROOT, 'azbuiltmain.py'), '--help'], tmp_path)) == []